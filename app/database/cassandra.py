@@ -1,9 +1,16 @@
-from cassandra.cluster import Cluster
+from cassandra.cluster import Cluster, ExecutionProfile, EXEC_PROFILE_DEFAULT
 from cassandra.auth import PlainTextAuthProvider
-from cassandra.query import SimpleStatement
-from cassandra import ReadTimeout, OperationTimedOut
+from cassandra.policies import ConstantSpeculativeExecutionPolicy, DCAwareRoundRobinPolicy, TokenAwarePolicy
+from cassandra.query import PreparedStatement, SimpleStatement
+from cassandra import ConsistencyLevel, ReadTimeout, OperationTimedOut
 
+import asyncio
 import os
+import threading
+
+from database.errors import StoreUnavailable
+from database.profiles import get_profile
+from models.flight import Flight
 
 # Настройки подключения
 CASSANDRA_CONTACT_POINTS = os.getenv("CASSANDRA_CONTACT_POINTS", "cassandra1,cassandra2,cassandra3").split(',')
@@ -12,17 +19,489 @@ CASSANDRA_KEYSPACE = os.getenv("CASSANDRA_KEYSPACE", "airportflightmanagement")
 CASSANDRA_USERNAME = os.getenv("CASSANDRA_USERNAME", "cassandra")
 CASSANDRA_PASSWORD = os.getenv("CASSANDRA_PASSWORD", "cassandra_password")
 
-auth_provider = PlainTextAuthProvider(username=CASSANDRA_USERNAME, password=CASSANDRA_PASSWORD)
-cluster = Cluster(contact_points=CASSANDRA_CONTACT_POINTS, port=CASSANDRA_PORT, auth_provider=auth_provider)
-cassandra_session = cluster.connect()
+# Настройки профилей выполнения
+CASSANDRA_LOCAL_DC = os.getenv("CASSANDRA_LOCAL_DC", "DC1")
+CASSANDRA_WRITE_TIMEOUT = float(os.getenv("CASSANDRA_WRITE_TIMEOUT", "10"))
+CASSANDRA_READ_TIMEOUT = float(os.getenv("CASSANDRA_READ_TIMEOUT", "2"))
+# Задержка перед повторной (спекулятивной) отправкой чтения на другой узел
+# и максимальное число таких отправок; 0 отключает спекулятивное выполнение
+CASSANDRA_SPECULATIVE_DELAY = float(os.getenv("CASSANDRA_SPECULATIVE_DELAY", "0.05"))
+CASSANDRA_SPECULATIVE_ATTEMPTS = int(os.getenv("CASSANDRA_SPECULATIVE_ATTEMPTS", "2"))
+
+# Имена профилей выполнения: запись (профиль по умолчанию) и идемпотентное чтение
+PROFILE_WRITE = EXEC_PROFILE_DEFAULT
+PROFILE_READ = "read"
+
+def _load_balancing_policy():
+    # Запрос отправляется на реплику ключа в локальном датацентре
+    return TokenAwarePolicy(DCAwareRoundRobinPolicy(local_dc=CASSANDRA_LOCAL_DC))
+
+def _speculative_execution_policy():
+    if CASSANDRA_SPECULATIVE_ATTEMPTS <= 0:
+        return None
+    return ConstantSpeculativeExecutionPolicy(delay=CASSANDRA_SPECULATIVE_DELAY, max_attempts=CASSANDRA_SPECULATIVE_ATTEMPTS)
 
-# Проверка подключения
-try:
-    cassandra_session.execute("SELECT now() FROM system.local")
+def _execution_profiles():
+    return {
+        PROFILE_WRITE: ExecutionProfile(
+            load_balancing_policy=_load_balancing_policy(),
+            request_timeout=CASSANDRA_WRITE_TIMEOUT
+        ),
+        PROFILE_READ: ExecutionProfile(
+            load_balancing_policy=_load_balancing_policy(),
+            request_timeout=CASSANDRA_READ_TIMEOUT,
+            speculative_execution_policy=_speculative_execution_policy()
+        ),
+    }
+
+# Подключение создаётся менеджером подключений (database/manager.py) при старте
+cluster = None
+cassandra_session = None
+
+def connect():
+    """Подключается к кластеру (блокирующий вызов, выполняется в отдельном потоке)."""
+    global cluster, cassandra_session
+    auth_provider = PlainTextAuthProvider(username=CASSANDRA_USERNAME, password=CASSANDRA_PASSWORD)
+    new_cluster = Cluster(
+        contact_points=CASSANDRA_CONTACT_POINTS,
+        port=CASSANDRA_PORT,
+        auth_provider=auth_provider,
+        execution_profiles=_execution_profiles()
+    )
+    try:
+        session = new_cluster.connect()
+        # Проверка подключения
+        session.execute("SELECT now() FROM system.local")
+        # Установите ключspace
+        session.set_keyspace(CASSANDRA_KEYSPACE)
+    except Exception:
+        new_cluster.shutdown()
+        raise
+    cluster, cassandra_session = new_cluster, session
     print("Подключение к Cassandra успешно.")
-except Exception as e:
-    print(f"Не удалось подключиться к Cassandra: {e}")
-    # Здесь можно добавить логику для повторной попытки подключения
 
-# Установите ключspace
-cassandra_session.set_keyspace(CASSANDRA_KEYSPACE)
+def get_session():
+    if cassandra_session is None:
+        raise StoreUnavailable("Cassandra")
+    return cassandra_session
+
+# Колонки таблицы flights в порядке, в котором они передаются в запросы.
+# Явный список вместо "SELECT *" нужен, чтобы метаданные подготовленного
+# запроса не устаревали при добавлении колонок в таблицу.
+FLIGHT_COLUMNS = (
+    "flightnumber",
+    "scheduleddeparturetime",
+    "scheduledarrivaltime",
+    "actualdeparturetime",
+    "actualarrivaltime",
+    "flightstatus",
+    "airlineid",
+    "aircraftid",
+    "routeid",
+)
+
+# Соответствие полей модели Flight колонкам таблицы (порядок полей модели
+# совпадает с FLIGHT_COLUMNS)
+FLIGHT_FIELDS = dict(zip(Flight.model_fields, FLIGHT_COLUMNS))
+
+# Колонки flights с индексами SAI (Storage-Attached Index, Cassandra 5) для
+# поиска рейсов: условия по нескольким таким колонкам объединяются в одном
+# запросе без ALLOW FILTERING, по scheduleddeparturetime возможен диапазон
+FLIGHT_SEARCH_COLUMNS = (
+    "flightstatus",
+    "airlineid",
+    "aircraftid",
+    "routeid",
+    "scheduleddeparturetime",
+)
+
+# Таблицы и индексы, которые создаёт само API (основные таблицы создаёт populate_cassandra.py)
+CQL_SCHEMA = [
+    # Outbox изменений рейсов для фоновой синхронизации графа в Neo4j.
+    # Событие хранит только номер рейса: актуальное состояние читается из
+    # flights в момент обработки. Раздел — шард и корзина времени записи,
+    # обработанная корзина удаляется целиком одним надгробием раздела, а не
+    # построчно. Короткий gc_grace_seconds безопасен: воскресшее событие
+    # оказывается в уже пройденной корзине и больше не читается.
+    """
+    CREATE TABLE IF NOT EXISTS graph_outbox_events (
+        shard int,
+        bucket bigint,
+        event_id timeuuid,
+        flightnumber text,
+        PRIMARY KEY ((shard, bucket), event_id)
+    ) WITH CLUSTERING ORDER BY (event_id ASC)
+      AND gc_grace_seconds = 3600
+    """,
+    # Первая неудалённая корзина каждого шарда outbox
+    """
+    CREATE TABLE IF NOT EXISTS graph_outbox_watermarks (
+        shard int PRIMARY KEY,
+        bucket bigint
+    )
+    """,
+    # Аренда шардов outbox: каждый шард обрабатывает только процесс-владелец
+    # строки, строка истекает по TTL, если владелец перестал её продлевать
+    """
+    CREATE TABLE IF NOT EXISTS graph_outbox_leases (
+        shard int PRIMARY KEY,
+        owner text
+    )
+    """,
+    # Табло вылетов и прилётов: один раздел — аэропорт, день (UTC) и
+    # направление, рейсы внутри раздела упорядочены по времени по расписанию
+    """
+    CREATE TABLE IF NOT EXISTS flights_by_airport_day (
+        airport text,
+        day date,
+        direction text,
+        scheduledtime timestamp,
+        flightnumber text,
+        scheduleddeparturetime timestamp,
+        scheduledarrivaltime timestamp,
+        actualdeparturetime timestamp,
+        actualarrivaltime timestamp,
+        flightstatus text,
+        airlineid text,
+        aircraftid text,
+        routeid text,
+        PRIMARY KEY ((airport, day, direction), scheduledtime, flightnumber)
+    ) WITH CLUSTERING ORDER BY (scheduledtime ASC, flightnumber ASC)
+    """,
+    # Положение рейса на табло: нужно, чтобы удалить устаревшие строки при
+    # переносе рейса на другое время или маршрут и при его удалении
+    """
+    CREATE TABLE IF NOT EXISTS flight_board_entries (
+        flightnumber text,
+        airport text,
+        day date,
+        direction text,
+        scheduledtime timestamp,
+        PRIMARY KEY (flightnumber, airport, day, direction)
+    )
+    """,
+    # Счётчики билетов: по рейсам и общие итоги (одна строка TICKET_TOTALS_KEY).
+    # Обновляются при выдаче и отмене билетов, сверяются с MongoDB
+    # заданием services/ticket_stats.py
+    """
+    CREATE TABLE IF NOT EXISTS flight_ticket_counts (
+        flightnumber text PRIMARY KEY,
+        tickets counter
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ticket_totals (
+        name text PRIMARY KEY,
+        tickets counter,
+        flights counter
+    )
+    """,
+    *(
+        f"CREATE CUSTOM INDEX IF NOT EXISTS flights_{column}_sai ON flights ({column}) USING 'StorageAttachedIndex'"
+        for column in FLIGHT_SEARCH_COLUMNS
+    ),
+]
+
+# Все CQL-запросы API. Каждый из них подготавливается один раз на сессию.
+CQL_STATEMENTS = {
+    "select_flight": f"""
+        SELECT {", ".join(FLIGHT_COLUMNS)} FROM flights WHERE flightnumber = ?
+    """,
+    "insert_flight": f"""
+        INSERT INTO flights ({", ".join(FLIGHT_COLUMNS)})
+        VALUES ({", ".join("?" for _ in FLIGHT_COLUMNS)})
+        IF NOT EXISTS
+    """,
+    "update_flight": f"""
+        UPDATE flights
+        SET {", ".join(f"{column} = ?" for column in FLIGHT_COLUMNS[1:])}
+        WHERE flightnumber = ?
+        IF EXISTS
+    """,
+    "delete_flight": """
+        DELETE FROM flights WHERE flightnumber = ? IF EXISTS
+    """,
+    "select_routes": """
+        SELECT routeid, origin, destination, distance, traveltime FROM routes
+    """,
+    "select_route": """
+        SELECT origin, destination FROM routes WHERE routeid = ?
+    """,
+    "select_board": f"""
+        SELECT {", ".join(FLIGHT_COLUMNS)} FROM flights_by_airport_day
+        WHERE airport = ? AND day = ? AND direction = ?
+    """,
+    "insert_board_flight": f"""
+        INSERT INTO flights_by_airport_day (airport, day, direction, scheduledtime, {", ".join(FLIGHT_COLUMNS)})
+        VALUES (?, ?, ?, ?, {", ".join("?" for _ in FLIGHT_COLUMNS)})
+    """,
+    "delete_board_flight": """
+        DELETE FROM flights_by_airport_day
+        WHERE airport = ? AND day = ? AND direction = ? AND scheduledtime = ? AND flightnumber = ?
+    """,
+    "select_board_entries": """
+        SELECT airport, day, direction, scheduledtime FROM flight_board_entries WHERE flightnumber = ?
+    """,
+    "insert_board_entry": """
+        INSERT INTO flight_board_entries (flightnumber, airport, day, direction, scheduledtime) VALUES (?, ?, ?, ?, ?)
+    """,
+    "delete_board_entry": """
+        DELETE FROM flight_board_entries WHERE flightnumber = ? AND airport = ? AND day = ? AND direction = ?
+    """,
+    "increment_flight_tickets": """
+        UPDATE flight_ticket_counts SET tickets = tickets + ? WHERE flightnumber = ?
+    """,
+    "increment_ticket_totals": """
+        UPDATE ticket_totals SET tickets = tickets + ?, flights = flights + ? WHERE name = ?
+    """,
+    "select_flight_tickets": """
+        SELECT tickets FROM flight_ticket_counts WHERE flightnumber = ?
+    """,
+    "select_flight_ticket_counts": """
+        SELECT flightnumber, tickets FROM flight_ticket_counts
+    """,
+    "select_ticket_totals": """
+        SELECT tickets, flights FROM ticket_totals WHERE name = ?
+    """,
+    "insert_outbox_event": """
+        INSERT INTO graph_outbox_events (shard, bucket, event_id, flightnumber) VALUES (?, ?, now(), ?)
+    """,
+    "select_outbox_events": """
+        SELECT event_id, flightnumber FROM graph_outbox_events WHERE shard = ? AND bucket = ? LIMIT ?
+    """,
+    "select_outbox_events_after": """
+        SELECT event_id, flightnumber FROM graph_outbox_events
+        WHERE shard = ? AND bucket = ? AND event_id > ? LIMIT ?
+    """,
+    "delete_outbox_bucket": """
+        DELETE FROM graph_outbox_events WHERE shard = ? AND bucket = ?
+    """,
+    "select_outbox_backlog": """
+        SELECT event_id FROM graph_outbox_events WHERE shard = ? AND bucket IN ? LIMIT ?
+    """,
+    "select_outbox_watermark": """
+        SELECT bucket FROM graph_outbox_watermarks WHERE shard = ?
+    """,
+    "select_outbox_watermarks": """
+        SELECT shard, bucket FROM graph_outbox_watermarks
+    """,
+    "update_outbox_watermark": """
+        UPDATE graph_outbox_watermarks SET bucket = ? WHERE shard = ?
+    """,
+    "acquire_outbox_lease": """
+        INSERT INTO graph_outbox_leases (shard, owner) VALUES (?, ?) IF NOT EXISTS USING TTL ?
+    """,
+    "renew_outbox_lease": """
+        UPDATE graph_outbox_leases USING TTL ? SET owner = ? WHERE shard = ? IF owner = ?
+    """,
+    "release_outbox_lease": """
+        DELETE FROM graph_outbox_leases WHERE shard = ? IF owner = ?
+    """,
+}
+
+
+# Идемпотентные запросы: только для них драйвер применяет спекулятивное выполнение
+IDEMPOTENT_STATEMENTS = {
+    "select_flight",
+    "select_routes",
+    "select_route",
+    "select_board",
+    "select_board_entries",
+    "select_flight_tickets",
+    "select_flight_ticket_counts",
+    "select_ticket_totals",
+    "select_outbox_events",
+    "select_outbox_events_after",
+    "select_outbox_backlog",
+    "select_outbox_watermark",
+    "select_outbox_watermarks",
+}
+
+
+class PreparedStatementRegistry:
+    """
+    Реестр подготовленных запросов.
+
+    Запрос подготавливается при первом обращении и переиспользуется до смены
+    сессии (переподключение) или явного сброса через invalidate()
+    (например, после изменения схемы).
+    """
+
+    def __init__(self, statements, idempotent=()):
+        self._statements = dict(statements)
+        self._idempotent = set(idempotent)
+        self._prepared = {}
+        self._session = None
+        self._lock = threading.Lock()
+
+    def register(self, name, query, idempotent=False):
+        with self._lock:
+            self._statements[name] = query
+            if idempotent:
+                self._idempotent.add(name)
+            else:
+                self._idempotent.discard(name)
+            self._prepared.pop(name, None)
+
+    def get(self, name, session=None):
+        session = session or get_session()
+        prepared = self._prepared.get(name)
+        if prepared is not None and self._session is session:
+            return prepared
+        with self._lock:
+            if self._session is not session:
+                self._prepared = {}
+                self._session = session
+            prepared = self._prepared.get(name)
+            if prepared is None:
+                prepared = session.prepare(self._statements[name])
+                prepared.is_idempotent = name in self._idempotent
+                self._prepared[name] = prepared
+            return prepared
+
+    def __contains__(self, name):
+        return name in self._statements
+
+    def invalidate(self):
+        with self._lock:
+            self._prepared = {}
+
+
+statements = PreparedStatementRegistry(CQL_STATEMENTS, IDEMPOTENT_STATEMENTS)
+
+
+def get_statement(name):
+    return statements.get(name)
+
+
+def _select_columns_statement(name, query):
+    # Запросы с выбором колонок регистрируются при первом использовании
+    # (по одному на набор колонок) и подготавливаются как обычные
+    if name not in statements:
+        statements.register(name, query, idempotent=True)
+    return statements.get(name)
+
+
+def select_flights_statement(columns):
+    """Подготовленный запрос постраничного чтения flights с выбранными колонками."""
+    return _select_columns_statement(
+        f"select_flights:{','.join(columns)}",
+        f"SELECT {', '.join(columns)} FROM flights"
+    )
+
+
+def select_flight_statement(columns):
+    """Подготовленный запрос чтения одного рейса с выбранными колонками."""
+    return _select_columns_statement(
+        f"select_flight:{','.join(columns)}",
+        f"SELECT {', '.join(columns)} FROM flights WHERE flightnumber = ?"
+    )
+
+
+def search_flights_statement(columns, conditions):
+    """
+    Подготовленный запрос поиска рейсов по индексам SAI с выбранными колонками;
+    conditions — условия вида "flightstatus = ?" по колонкам FLIGHT_SEARCH_COLUMNS.
+    """
+    where = " AND ".join(conditions)
+    return _select_columns_statement(
+        f"search_flights:{','.join(columns)}:{where}",
+        f"SELECT {', '.join(columns)} FROM flights WHERE {where}"
+    )
+
+
+# Значения рейса в порядке колонок FLIGHT_COLUMNS
+def flight_values(flight: Flight) -> tuple:
+    return (
+        flight.FlightNumber,
+        flight.ScheduledDepartureTime,
+        flight.ScheduledArrivalTime,
+        flight.ActualDepartureTime,
+        flight.ActualArrivalTime,
+        flight.FlightStatus,
+        flight.AirlineID,
+        flight.AircraftID,
+        flight.RouteID
+    )
+
+
+# Преобразование строки таблицы flights в Pydantic модель
+def flight_from_row(row) -> Flight:
+    return Flight(
+        FlightNumber=row.flightnumber,
+        ScheduledDepartureTime=row.scheduleddeparturetime,
+        ScheduledArrivalTime=row.scheduledarrivaltime,
+        ActualDepartureTime=row.actualdeparturetime,
+        ActualArrivalTime=row.actualarrivaltime,
+        FlightStatus=row.flightstatus,
+        AirlineID=row.airlineid,
+        AircraftID=row.aircraftid,
+        RouteID=row.routeid
+    )
+
+
+# Частичное представление рейса: только выбранные поля модели Flight, без валидации
+def flight_fields_from_row(row, fields) -> dict:
+    return {field: getattr(row, FLIGHT_FIELDS[field]) for field in fields}
+
+
+def _set_future_result(future, result):
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_future_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
+
+
+def _with_consistency(statement, parameters, endpoint):
+    # Уровень согласованности берётся из профиля эндпоинта (database/profiles.py)
+    consistency_level = ConsistencyLevel.name_to_value[get_profile(endpoint)["cassandra_consistency"]]
+    if isinstance(statement, PreparedStatement):
+        statement = statement.bind(parameters)
+        parameters = None
+    elif isinstance(statement, str):
+        statement = SimpleStatement(statement)
+    statement.consistency_level = consistency_level
+    return statement, parameters
+
+
+async def execute_async(statement, parameters=None, endpoint=None, **kwargs):
+    """
+    Выполняет запрос через session.execute_async, не блокируя event loop.
+
+    Колбэки драйвера вызываются в его собственном потоке, поэтому результат
+    передаётся в asyncio-future через call_soon_threadsafe.
+    Если указан endpoint, применяется уровень согласованности его профиля.
+    Возвращает ResultSet с первой страницей результата.
+    """
+    if endpoint is not None:
+        statement, parameters = _with_consistency(statement, parameters, endpoint)
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    response_future = get_session().execute_async(statement, parameters, **kwargs)
+
+    def on_success(_rows):
+        # Результат уже получен, result() возвращает ResultSet без ожидания
+        loop.call_soon_threadsafe(_set_future_result, future, response_future.result())
+
+    def on_error(exc):
+        loop.call_soon_threadsafe(_set_future_exception, future, exc)
+
+    response_future.add_callbacks(on_success, on_error)
+    return await future
+
+
+async def ensure_schema():
+    for statement in CQL_SCHEMA:
+        await execute_async(statement)
+    # После изменения схемы подготовленные запросы нужно подготовить заново
+    statements.invalidate()
+
+
+def close_session():
+    global cluster, cassandra_session
+    if cluster is not None:
+        cluster.shutdown()
+    cluster, cassandra_session = None, None
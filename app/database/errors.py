@@ -0,0 +1,6 @@
+class StoreUnavailable(Exception):
+    """Хранилище ещё не подключено (или недоступно); API отвечает 503."""
+
+    def __init__(self, store: str):
+        super().__init__(f"Хранилище {store} недоступно")
+        self.store = store
@@ -0,0 +1,127 @@
+from database import cassandra, mongodb, neo4j
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Задержка между попытками подключения растёт от начальной до максимальной
+DB_CONNECT_INITIAL_BACKOFF = float(os.getenv("DB_CONNECT_INITIAL_BACKOFF", "0.5"))
+DB_CONNECT_MAX_BACKOFF = float(os.getenv("DB_CONNECT_MAX_BACKOFF", "30"))
+
+
+# Если после подключения не удалось создать индексы или схему, клиент
+# закрывается: повторная попытка создаст новый, и без закрытия каждая
+# неудачная попытка оставляла бы открытыми пул соединений и потоки драйвера
+
+async def _connect_mongodb():
+    await mongodb.connect()
+    try:
+        await mongodb.ensure_indexes()
+    except BaseException:
+        await mongodb.close_client()
+        raise
+
+
+async def _connect_cassandra():
+    # Драйвер Cassandra подключается синхронно, поэтому в отдельном потоке
+    await asyncio.to_thread(cassandra.connect)
+    try:
+        await cassandra.ensure_schema()
+    except BaseException:
+        await asyncio.to_thread(cassandra.close_session)
+        raise
+
+
+async def _connect_neo4j():
+    await neo4j.init_driver()
+
+
+class ConnectionManager:
+    """
+    Подключение к MongoDB, Cassandra и Neo4j в фоне.
+
+    Хранилища подключаются параллельно, каждое — с повторными попытками и
+    экспоненциальной задержкой. Приложение начинает принимать запросы сразу:
+    до подключения хранилища обращения к нему завершаются ответом 503.
+    """
+
+    def __init__(self):
+        self._connectors = {
+            "mongodb": _connect_mongodb,
+            "cassandra": _connect_cassandra,
+            "neo4j": _connect_neo4j,
+        }
+        self._ready = {name: asyncio.Event() for name in self._connectors}
+        self._tasks = []
+        self.attempts = {name: 0 for name in self._connectors}
+        self.errors = {name: None for name in self._connectors}
+
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self._connect_with_backoff(name, connector))
+            for name, connector in self._connectors.items()
+        ]
+
+    async def _connect_with_backoff(self, name, connector):
+        backoff = DB_CONNECT_INITIAL_BACKOFF
+        while True:
+            self.attempts[name] += 1
+            try:
+                await connector()
+                self.errors[name] = None
+                self._ready[name].set()
+                logger.info(f"Хранилище {name} подключено")
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors[name] = str(e)
+                logger.error(f"Не удалось подключиться к {name}, повтор через {backoff} с: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, DB_CONNECT_MAX_BACKOFF)
+
+    async def wait_ready(self, *names):
+        await asyncio.gather(*(self._ready[name].wait() for name in names or self._connectors))
+
+    def is_ready(self) -> bool:
+        return all(event.is_set() for event in self._ready.values())
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "ready": self._ready[name].is_set(),
+                "attempts": self.attempts[name],
+                "last_error": self.errors[name],
+            }
+            for name in self._connectors
+        }
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await mongodb.close_client()
+        await asyncio.to_thread(cassandra.close_session)
+        await neo4j.close_driver()
+        for event in self._ready.values():
+            event.clear()
+
+
+connection_manager = ConnectionManager()
+
+
+def _reset_after_fork():
+    # Сокеты и потоки драйверов родительского процесса в дочернем непригодны,
+    # а их закрытие сломало бы подключения родителя. Дочерний процесс просто
+    # забывает о них и подключается заново при запуске своего lifespan.
+    mongodb.client = mongodb.db = None
+    mongodb.passengers_collection = mongodb.tickets_collection = mongodb.baggage_collection = None
+    mongodb._passengers_collections.clear()
+    cassandra.cluster = cassandra.cassandra_session = None
+    neo4j.driver = None
+    connection_manager.__init__()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
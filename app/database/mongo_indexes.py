@@ -0,0 +1,83 @@
+"""
+Индексы коллекций MongoDB.
+
+Все индексы объявлены здесь и создаются идемпотентно при старте приложения
+(см. database/manager.py) или вручную из каталога app:
+
+    python -m database.mongo_indexes ensure
+    python -m database.mongo_indexes report
+"""
+from pymongo import ASCENDING, IndexModel
+import asyncio
+import json
+import sys
+
+# Объявленные индексы по коллекциям. Имена совпадают с именами, которые
+# MongoDB выбирает по умолчанию, поэтому уже существующие индексы не дублируются.
+INDEXES = {
+    "Passengers": [
+        IndexModel([("PassengerID", ASCENDING)], name="PassengerID_1", unique=True),
+        # Многоключевые индексы по элементам массива Tickets
+        IndexModel([("Tickets.TicketNumber", ASCENDING)], name="Tickets.TicketNumber_1"),
+        IndexModel([("Tickets.Baggage.BaggageNumber", ASCENDING)], name="Tickets.Baggage.BaggageNumber_1"),
+        IndexModel([("LastName", ASCENDING), ("FirstName", ASCENDING)], name="LastName_1_FirstName_1"),
+        # Поиск багажа по местоположению и статусу (оба поля из одного массива)
+        IndexModel(
+            [("Tickets.Baggage.Location", ASCENDING), ("Tickets.Baggage.BaggageStatus", ASCENDING)],
+            name="Tickets.Baggage.Location_1_Tickets.Baggage.BaggageStatus_1"
+        ),
+        # Поиск по числу билетов с сортировкой, устойчивой при постраничной выдаче
+        IndexModel([("TicketCount", ASCENDING), ("PassengerID", ASCENDING)], name="TicketCount_1_PassengerID_1"),
+    ],
+}
+
+
+async def ensure_indexes(db):
+    """Создаёт недостающие индексы. Уже существующие индексы не пересоздаются."""
+    for collection_name, indexes in INDEXES.items():
+        await db[collection_name].create_indexes(indexes)
+
+
+async def index_report(db) -> dict:
+    """
+    Отчёт по индексам: объявленные, но отсутствующие в базе; существующие, но
+    не объявленные здесь; индексы без обращений с момента запуска сервера
+    (по данным $indexStats).
+    """
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        declared = {index.document["name"] for index in indexes}
+        cursor = await collection.aggregate([{"$indexStats": {}}])
+        stats = await cursor.to_list(None)
+        usage = {stat["name"]: stat["accesses"]["ops"] for stat in stats}
+        existing = set(usage) - {"_id_"}
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared),
+            "unused": sorted(name for name in existing if usage[name] == 0),
+            "accesses": usage,
+        }
+    return report
+
+
+async def _main(command: str):
+    # Импорт здесь, чтобы модуль можно было использовать без подключения
+    from database import mongodb
+    await mongodb.connect()
+    try:
+        if command == "ensure":
+            await ensure_indexes(mongodb.db)
+            print("Индексы MongoDB созданы.")
+        else:
+            report = await index_report(mongodb.db)
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+    finally:
+        await mongodb.close_client()
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "report"
+    if command not in ("ensure", "report"):
+        sys.exit("Использование: python -m database.mongo_indexes [ensure|report]")
+    asyncio.run(_main(command))
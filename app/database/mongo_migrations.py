@@ -0,0 +1,43 @@
+"""
+Миграции данных MongoDB. Запуск из каталога app:
+
+    python -m database.mongo_migrations
+
+Миграции идемпотентны: обрабатываются только документы, которые ещё не
+были приведены к новой схеме.
+"""
+import asyncio
+
+
+async def backfill_ticket_count(db) -> int:
+    """Заполняет поле TicketCount у пассажиров, созданных до его появления."""
+    result = await db["Passengers"].update_many(
+        {"TicketCount": {"$exists": False}},
+        [{"$set": {"TicketCount": {"$size": {"$ifNull": ["$Tickets", []]}}}}]
+    )
+    return result.modified_count
+
+
+MIGRATIONS = [
+    backfill_ticket_count,
+]
+
+
+async def run_migrations(db):
+    for migration in MIGRATIONS:
+        modified = await migration(db)
+        print(f"Миграция {migration.__name__}: изменено документов {modified}.")
+
+
+async def _main():
+    # Импорт здесь, чтобы модуль можно было использовать без подключения
+    from database import mongodb
+    await mongodb.connect()
+    try:
+        await run_migrations(mongodb.db)
+    finally:
+        await mongodb.close_client()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,21 +1,79 @@
 import os
-from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError
+from pymongo import AsyncMongoClient, ReadPreference, WriteConcern
+from database import mongo_indexes
+from database.errors import StoreUnavailable
+from database.pools import MONGO_POOL_BUDGET, worker_pool_size
+from database.profiles import get_profile
 
 # Настройки подключения
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0")
+MONGO_DATABASE = "AirportFlightManagement"
+# Размер пула на воркер; по умолчанию — доля MONGO_POOL_BUDGET
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE") or worker_pool_size(MONGO_POOL_BUDGET))
 
-try:
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    # Попытка подключиться к серверу
-    client.admin.command('ping')
-    print("Подключение к MongoDB успешно.")
-    db = client['AirportFlightManagement']
+# Клиент и коллекции создаются менеджером подключений (database/manager.py) при старте
+client = None
+db = None
+passengers_collection = None
+tickets_collection = None
+baggage_collection = None
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+_passengers_collections = {}
+
+def get_db():
+    if db is None:
+        raise StoreUnavailable("MongoDB")
+    return db
+
+def get_passengers_collection(endpoint: str):
+    if passengers_collection is None:
+        raise StoreUnavailable("MongoDB")
+    # Коллекция с read preference и write concern из профиля эндпоинта
+    if endpoint not in _passengers_collections:
+        profile = get_profile(endpoint)
+        write_concern = profile["mongo_write_concern"]
+        _passengers_collections[endpoint] = passengers_collection.with_options(
+            read_preference=READ_PREFERENCES[profile["mongo_read_preference"]],
+            write_concern=WriteConcern(**write_concern) if write_concern else None
+        )
+    return _passengers_collections[endpoint]
 
-# Коллекции
+async def connect():
+    global client, db, passengers_collection, tickets_collection, baggage_collection
+    new_client = AsyncMongoClient(MONGO_URI, serverSelectionTimeoutMS=5000, maxPoolSize=MONGO_MAX_POOL_SIZE)
+    try:
+        # Попытка подключиться к серверу
+        await new_client.admin.command('ping')
+    except Exception:
+        # Клиент закрывается при любой ошибке, иначе повторные попытки
+        # подключения оставляли бы открытые пулы
+        await new_client.close()
+        raise
+    client = new_client
+    db = client[MONGO_DATABASE]
+
+    # Коллекции
     passengers_collection = db['Passengers']
     tickets_collection = db['Tickets']
     baggage_collection = db['Baggage']
-except ServerSelectionTimeoutError as err:
-    print(f"Не удалось подключиться к MongoDB: {err}")
-    # Здесь можно добавить логику для повторной попытки подключения
+    _passengers_collections.clear()
+    print("Подключение к MongoDB успешно.")
+
+async def ensure_indexes():
+    # Объявленные индексы коллекций (в том числе уникальный PassengerID)
+    await mongo_indexes.ensure_indexes(db)
+
+async def close_client():
+    global client, db, passengers_collection, tickets_collection, baggage_collection
+    if client is not None:
+        await client.close()
+    client = db = passengers_collection = tickets_collection = baggage_collection = None
+    _passengers_collections.clear()
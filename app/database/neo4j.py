@@ -1,32 +1,98 @@
-from neo4j import GraphDatabase
+from neo4j import Address, AsyncGraphDatabase
 from neo4j.exceptions import ServiceUnavailable
+from database.errors import StoreUnavailable
+from database.pools import NEO4J_POOL_BUDGET, worker_pool_size
+from database.profiles import get_profile
+from urllib.parse import urlparse
 import os
 import itertools
 import time
 
 # Настройки подключения
-NEO4J_URIS = os.getenv("NEO4J_URIS", "bolt://neo4j1:7687,bolt://neo4j2:7687,bolt://neo4j3:7687").split(',')
+NEO4J_URIS = os.getenv("NEO4J_URIS", "neo4j://neo4j1:7687,neo4j://neo4j2:7687,neo4j://neo4j3:7687").split(',')
 NEO4J_USER = os.getenv("NEO4J_USER", "neo4j")
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
+# Маршрутизация по кластеру (neo4j://). Для одиночного сервера можно отключить,
+# тогда используется прямое подключение (bolt://) к первому доступному узлу
+NEO4J_ROUTING = os.getenv("NEO4J_ROUTING", "true").lower() == "true"
+# Размер пула на воркер; по умолчанию — доля NEO4J_POOL_BUDGET
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE") or worker_pool_size(NEO4J_POOL_BUDGET))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
 
-def get_driver():
+# Драйвер создаётся менеджером подключений (database/manager.py) при старте
+driver = None
+
+def _member_addresses():
+    addresses = []
+    for uri in NEO4J_URIS:
+        parsed = urlparse(uri.strip())
+        addresses.append(Address((parsed.hostname, parsed.port or 7687)))
+    return addresses
+
+def _resolve(address):
+    # Вызывается драйвером при первичном и повторном построении таблицы
+    # маршрутизации: пробуются все узлы из NEO4J_URIS, а не только адрес из URI
+    return _member_addresses()
+
+def _driver_options():
+    return {
+        "auth": (NEO4J_USER, NEO4J_PASSWORD),
+        "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+    }
+
+async def get_routing_driver():
+    members = _member_addresses()
+    uri = f"neo4j://{members[0].host}:{members[0].port}"
+    driver = AsyncGraphDatabase.driver(uri, resolver=_resolve, **_driver_options())
+    try:
+        # Тестирование подключения (получение таблицы маршрутизации кластера)
+        await driver.verify_connectivity()
+        print(f"Подключение к кластеру Neo4j ({', '.join(str(m) for m in members)}) успешно.")
+        return driver
+    except ServiceUnavailable as e:
+        await driver.close()
+        raise Exception(f"Не удалось подключиться ни к одному из узлов Neo4j: {e}")
+    except BaseException:
+        await driver.close()
+        raise
+
+async def get_driver():
+    if NEO4J_ROUTING:
+        return await get_routing_driver()
     for uri in NEO4J_URIS:
+        parsed = urlparse(uri.strip())
+        uri = f"bolt://{parsed.hostname}:{parsed.port or 7687}"
+        driver = AsyncGraphDatabase.driver(uri, **_driver_options())
         try:
-            driver = GraphDatabase.driver(uri, auth=(NEO4J_USER, NEO4J_PASSWORD))
             # Тестирование подключения
-            with driver.session() as session:
-                session.run("RETURN 1")
+            await driver.verify_connectivity()
             print(f"Подключение к {uri} успешно.")
             return driver
         except ServiceUnavailable as e:
             print(f"Не удалось подключиться к {uri}: {e}")
+            await driver.close()
+        except BaseException:
+            await driver.close()
+            raise
     raise Exception("Не удалось подключиться ни к одному из узлов Neo4j.")
 
-driver = get_driver()
+async def init_driver():
+    global driver
+    driver = await get_driver()
 
-def get_neo4j_session():
-    return driver.session()
+def get_neo4j_session(endpoint=None):
+    if driver is None:
+        raise StoreUnavailable("Neo4j")
+    if endpoint is None:
+        return driver.session()
+    # Режим доступа (READ/WRITE) берётся из профиля эндпоинта: при маршрутизации
+    # чтения уходят на читающие узлы кластера, записи — на лидера
+    return driver.session(default_access_mode=get_profile(endpoint)["neo4j_access_mode"])
 
 # Глобальная функция для закрытия драйвера при завершении работы приложения
-def close_driver():
-    driver.close()
+async def close_driver():
+    global driver
+    if driver is not None:
+        await driver.close()
+    driver = None
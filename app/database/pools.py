@@ -0,0 +1,14 @@
+import os
+
+# Число процессов API. Задаётся точкой входа serve.py для всех воркеров,
+# чтобы каждый из них занимал свою долю общего бюджета подключений
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+
+# Общий бюджет подключений на все воркеры одного хоста
+MONGO_POOL_BUDGET = int(os.getenv("MONGO_POOL_BUDGET", "100"))
+NEO4J_POOL_BUDGET = int(os.getenv("NEO4J_POOL_BUDGET", "100"))
+
+
+def worker_pool_size(budget: int) -> int:
+    """Размер пула одного воркера: равная доля бюджета, но не меньше одного подключения."""
+    return max(1, budget // max(1, API_WORKERS))
@@ -0,0 +1,91 @@
+import json
+import os
+
+# Файл с переопределением профилей (JSON той же структуры, что и значения ниже):
+# {"profiles": {"read": {"cassandra_consistency": "LOCAL_QUORUM"}}, "endpoints": {"get_passenger": "strong_read"}}
+CONSISTENCY_PROFILES_FILE = os.getenv("CONSISTENCY_PROFILES_FILE")
+
+# Профили согласованности и маршрутизации чтения для всех трёх хранилищ
+PROFILES = {
+    # Чтение, допускающее небольшое отставание реплик
+    "read": {
+        "mongo_read_preference": "secondaryPreferred",
+        "mongo_write_concern": None,
+        "cassandra_consistency": "LOCAL_ONE",
+        "neo4j_access_mode": "READ",
+    },
+    # Чтение последних подтверждённых записей
+    "strong_read": {
+        "mongo_read_preference": "primary",
+        "mongo_write_concern": None,
+        "cassandra_consistency": "LOCAL_QUORUM",
+        "neo4j_access_mode": "READ",
+    },
+    "write": {
+        "mongo_read_preference": "primary",
+        "mongo_write_concern": {"w": "majority"},
+        "cassandra_consistency": "LOCAL_QUORUM",
+        "neo4j_access_mode": "WRITE",
+    },
+}
+
+# Профиль каждого эндпоинта (и фоновых задач) по имени функции
+ENDPOINT_PROFILES = {
+    "create_flight": "write",
+    "create_flights_bulk": "write",
+    "get_flight": "read",
+    "list_flights": "read",
+    "search_flights": "read",
+    "update_flight": "write",
+    "delete_flight": "write",
+    "get_flights_by_passenger": "read",
+    "get_average_tickets_per_flight": "read",
+    "get_flight_ticket_count": "read",
+    "create_passenger": "write",
+    "create_passengers_bulk": "write",
+    "get_passenger": "read",
+    "update_passenger": "write",
+    "delete_passenger": "write",
+    "get_passengers_with_min_tickets": "read",
+    "get_ticket": "read",
+    "update_ticket": "write",
+    "get_baggage": "read",
+    "update_baggage": "write",
+    "track_baggage": "read",
+    "search_baggage": "read",
+    "find_route_paths": "read",
+    "find_connections": "read",
+    "get_departures": "read",
+    "get_arrivals": "read",
+    # Загрузка графа маршрутов и расписания для поиска стыковок
+    "route_graph": "read",
+    "connection_index": "read",
+    # Счётчики билетов и их сверка
+    "ticket_stats": "write",
+    # Табло обновляется обработчиком outbox
+    "flight_board": "write",
+    # Обработчик outbox должен видеть результат только что выполненной записи
+    "graph_outbox": "strong_read",
+}
+
+DEFAULT_PROFILE = "write"
+
+
+def _load_overrides():
+    if not CONSISTENCY_PROFILES_FILE:
+        return
+    with open(CONSISTENCY_PROFILES_FILE) as f:
+        overrides = json.load(f)
+    for name, settings in overrides.get("profiles", {}).items():
+        PROFILES[name] = {**PROFILES.get(name, PROFILES[DEFAULT_PROFILE]), **settings}
+    for endpoint, name in overrides.get("endpoints", {}).items():
+        if name not in PROFILES:
+            raise ValueError(f"Неизвестный профиль согласованности {name} для {endpoint}")
+        ENDPOINT_PROFILES[endpoint] = name
+
+
+_load_overrides()
+
+
+def get_profile(endpoint: str) -> dict:
+    return PROFILES[ENDPOINT_PROFILES.get(endpoint, DEFAULT_PROFILE)]
@@ -1,15 +1,37 @@
-from fastapi import FastAPI
-from routers import passengers, flights
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from routers import passengers, flights, baggage, routes, airports, system
 from fastapi.middleware.cors import CORSMiddleware
-from database.mongodb import client as mongodb_client
-from database.cassandra import cassandra_session
-from database.neo4j import driver as neo4j_driver, close_driver
+from database.errors import StoreUnavailable
+from database.manager import connection_manager
+from services.connections import connection_index
+from services.graph_outbox import graph_outbox_worker
+from services.route_graph import route_graph_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Подключение к базам данных идёт в фоне: приложение сразу отвечает
+    # на проверки состояния, а готовность видна через /system/ready
+    print("Приложение запускается и подключается к базам данных.")
+    connection_manager.start()
+    graph_outbox_worker.start()
+    route_graph_service.start()
+    connection_index.start()
+    yield
+    print("Приложение завершается и закрывает подключения к базам данных.")
+    await connection_index.stop()
+    await route_graph_service.stop()
+    await graph_outbox_worker.stop()
+    await connection_manager.stop()
 
 
 app = FastAPI(
     title="Airport Flight Management API",
     description="API для управления данными аэропорта с использованием MongoDB, Cassandra и Neo4j",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Разрешение CORS (при необходимости)
@@ -24,18 +46,15 @@ app.add_middleware(
 # Включение маршрутов
 app.include_router(flights.router)
 app.include_router(passengers.router)
+app.include_router(baggage.router)
+app.include_router(routes.router)
+app.include_router(airports.router)
+app.include_router(system.router)
+
+@app.exception_handler(StoreUnavailable)
+async def store_unavailable_handler(request: Request, exc: StoreUnavailable):
+    return JSONResponse(status_code=503, content={"detail": str(exc)})
 
 @app.get("/")
 def read_root():
     return {"message": "Добро пожаловать в API системы управления полетами аэропорта"}
-
-@app.on_event("startup")
-async def startup_event():
-    print("Приложение запускается и подключается к базам данных.")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    print("Приложение завершается и закрывает подключения к базам данных.")
-    mongodb_client.close()
-    cassandra_session.shutdown()
-    close_driver()
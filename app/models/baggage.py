@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+from models.passenger import Baggage
+
+# Багаж вместе с билетом и пассажиром, к которым он относится
+class BaggageTracking(BaseModel):
+    PassengerID: str
+    TicketNumber: str
+    Baggage: Baggage
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class BulkItemResult(BaseModel):
+    Index: int
+    ID: Optional[str] = None
+    Status: str  # created | duplicate | invalid | error
+    Detail: Optional[str] = None
+
+class BulkResult(BaseModel):
+    Total: int
+    Succeeded: int
+    Failed: int
+    Items: List[BulkItemResult]
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import datetime
+
+class ConnectionLeg(BaseModel):
+    FlightNumber: str
+    Origin: str
+    Destination: str
+    DepartureTime: datetime
+    ArrivalTime: datetime
+
+# Вариант перелёта со стыковками
+class Connection(BaseModel):
+    Legs: List[ConnectionLeg]
+    Transfers: int
+    DepartureTime: datetime
+    ArrivalTime: datetime
@@ -11,6 +11,8 @@ class Baggage(BaseModel):
 
 class Ticket(BaseModel):
     TicketNumber: str
+    # Рейс, на который выдан билет (учитывается в счётчиках билетов рейса)
+    FlightNumber: Optional[str] = None
     Route: dict  # Можно создать отдельную модель для маршрута
     DepartureTime: datetime
     ArrivalTime: datetime
@@ -20,6 +22,24 @@ class Ticket(BaseModel):
     Ratings: List[int]
     Baggage: Baggage
 
+# Частичное обновление билета (PATCH): передаются только изменяемые поля
+class TicketUpdate(BaseModel):
+    FlightNumber: Optional[str] = None
+    Route: Optional[dict] = None
+    DepartureTime: Optional[datetime] = None
+    ArrivalTime: Optional[datetime] = None
+    Class: Optional[str] = None
+    Price: Optional[float] = None
+    TicketStatus: Optional[str] = None
+    Ratings: Optional[List[int]] = None
+
+# Частичное обновление багажа (PATCH), например, новое местоположение
+class BaggageUpdate(BaseModel):
+    BaggageType: Optional[str] = None
+    Weight: Optional[float] = None
+    BaggageStatus: Optional[str] = None
+    Location: Optional[str] = None
+
 class ContactInfo(BaseModel):
     Email: EmailStr
     Phone: str
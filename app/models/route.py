@@ -1,4 +1,5 @@
 from pydantic import BaseModel
+from typing import List
 
 class Route(BaseModel):
     RouteID: str
@@ -7,3 +8,8 @@ class Route(BaseModel):
     Distance: float
     TravelTime: int
 
+# Вариант маршрута с пересадками: последовательность перелётов и итоговые показатели
+class Itinerary(BaseModel):
+    Routes: List[Route]
+    Distance: float
+    TravelTime: int
@@ -0,0 +1,64 @@
+from cassandra import InvalidRequest
+from cassandra.protocol import ProtocolException
+from fastapi import APIRouter, HTTPException, Query, Response
+from datetime import date, datetime, timezone
+from typing import List, Optional
+import logging
+import os
+from models.flight import Flight
+from services.flight_board import ARRIVAL, DEPARTURE, get_board
+from utils.pagination import decode_paging_state, encode_paging_state
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/airports",
+    tags=["Airports"]
+)
+
+# Размер страницы табло
+AIRPORT_BOARD_PAGE_DEFAULT_SIZE = int(os.getenv("AIRPORT_BOARD_PAGE_DEFAULT_SIZE", "500"))
+AIRPORT_BOARD_PAGE_MAX_SIZE = int(os.getenv("AIRPORT_BOARD_PAGE_MAX_SIZE", "5000"))
+
+# Табло читается из flights_by_airport_day: один раздел на аэропорт, день и направление.
+# День считается по UTC, по умолчанию — текущий. Выдача постраничная, как у
+# GET /flights/: токен следующей страницы возвращается в заголовке X-Next-Token
+# и передаётся в параметре next.
+
+@router.get("/{code}/departures", response_model=List[Flight])
+async def get_departures(
+    code: str,
+    response: Response,
+    day: Optional[date] = Query(None, alias="date"),
+    limit: int = Query(AIRPORT_BOARD_PAGE_DEFAULT_SIZE, ge=1, le=AIRPORT_BOARD_PAGE_MAX_SIZE),
+    next_token: Optional[str] = Query(None, alias="next")
+):
+    day = day or datetime.now(timezone.utc).date()
+    logger.info(f"Получение вылетов из {code} за {day}")
+    return await _fetch_board_page(code, day, DEPARTURE, limit, next_token, "get_departures", response)
+
+@router.get("/{code}/arrivals", response_model=List[Flight])
+async def get_arrivals(
+    code: str,
+    response: Response,
+    day: Optional[date] = Query(None, alias="date"),
+    limit: int = Query(AIRPORT_BOARD_PAGE_DEFAULT_SIZE, ge=1, le=AIRPORT_BOARD_PAGE_MAX_SIZE),
+    next_token: Optional[str] = Query(None, alias="next")
+):
+    day = day or datetime.now(timezone.utc).date()
+    logger.info(f"Получение прилётов в {code} за {day}")
+    return await _fetch_board_page(code, day, ARRIVAL, limit, next_token, "get_arrivals", response)
+
+async def _fetch_board_page(code, day, direction, limit, next_token, endpoint, response):
+    paging_state = decode_paging_state(next_token) if next_token is not None else None
+    try:
+        flights, next_paging_state = await get_board(code, day, direction, endpoint, limit, paging_state)
+    except (InvalidRequest, ProtocolException):
+        # Токен другого запроса или байты, которые не разбираются как paging_state
+        if paging_state is None:
+            raise
+        raise HTTPException(status_code=400, detail="Некорректный токен страницы")
+    if next_paging_state:
+        response.headers["X-Next-Token"] = encode_paging_state(next_paging_state)
+    return flights
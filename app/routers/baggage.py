@@ -0,0 +1,71 @@
+from fastapi import APIRouter, HTTPException, Query
+from typing import List, Optional
+import logging
+import os
+from models.baggage import BaggageTracking
+from database.mongodb import get_passengers_collection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/baggage",
+    tags=["Baggage"]
+)
+
+# Размер выдачи поиска багажа
+BAGGAGE_SEARCH_DEFAULT_LIMIT = int(os.getenv("BAGGAGE_SEARCH_DEFAULT_LIMIT", "100"))
+BAGGAGE_SEARCH_MAX_LIMIT = int(os.getenv("BAGGAGE_SEARCH_MAX_LIMIT", "1000"))
+
+# Багаж хранится внутри билетов пассажира, поиск идёт по многоключевым
+# индексам на Tickets.Baggage.* (см. database/mongo_indexes.py), отдельная
+# коллекция багажа не ведётся
+
+def tracking_from_ticket(passenger_id: str, ticket) -> BaggageTracking:
+    return BaggageTracking(
+        PassengerID=passenger_id,
+        TicketNumber=ticket["TicketNumber"],
+        Baggage=ticket["Baggage"]
+    )
+
+@router.get("/", response_model=List[BaggageTracking])
+async def search_baggage(
+    location: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = Query(BAGGAGE_SEARCH_DEFAULT_LIMIT, ge=1, le=BAGGAGE_SEARCH_MAX_LIMIT)
+):
+    logger.info(f"Поиск багажа: местоположение {location}, статус {status}")
+    if location is None and status is None:
+        raise HTTPException(status_code=400, detail="Укажите location и/или status")
+    passengers_collection = get_passengers_collection("search_baggage")
+    # Оба условия должны выполняться для одного и того же багажа
+    condition = {}
+    if location is not None:
+        condition["Baggage.Location"] = location
+    if status is not None:
+        condition["Baggage.BaggageStatus"] = status
+    pipeline = [
+        # Отбор пассажиров по индексу Tickets.Baggage.Location_1_Tickets.Baggage.BaggageStatus_1
+        {"$match": {"Tickets": {"$elemMatch": condition}}},
+        {"$project": {"_id": 0, "PassengerID": 1, "Tickets.TicketNumber": 1, "Tickets.Baggage": 1}},
+        {"$unwind": "$Tickets"},
+        {"$match": {f"Tickets.{field}": value for field, value in condition.items()}},
+        {"$limit": limit},
+    ]
+    cursor = await passengers_collection.aggregate(pipeline)
+    results = await cursor.to_list(None)
+    logger.info(f"Найдено багажа: {len(results)}")
+    return [tracking_from_ticket(r["PassengerID"], r["Tickets"]) for r in results]
+
+@router.get("/{baggage_number}", response_model=BaggageTracking)
+async def track_baggage(baggage_number: str):
+    logger.info(f"Получение багажа с номером: {baggage_number}")
+    passengers_collection = get_passengers_collection("track_baggage")
+    # Поиск по индексу Tickets.Baggage.BaggageNumber_1, возвращается только нужный билет
+    passenger = await passengers_collection.find_one(
+        {"Tickets.Baggage.BaggageNumber": baggage_number},
+        {"_id": 0, "PassengerID": 1, "Tickets": {"$elemMatch": {"Baggage.BaggageNumber": baggage_number}}}
+    )
+    if not passenger:
+        raise HTTPException(status_code=404, detail="Багаж не найден")
+    return tracking_from_ticket(passenger["PassengerID"], passenger["Tickets"][0])
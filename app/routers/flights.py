@@ -1,9 +1,30 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from cassandra import InvalidRequest
+from cassandra.protocol import ProtocolException
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from datetime import datetime
+from typing import List, Optional
+from models.bulk import BulkItemResult, BulkResult
 from models.flight import Flight
-from database.cassandra import cassandra_session
+from database.cassandra import (
+    FLIGHT_FIELDS, PROFILE_READ, execute_async, flight_fields_from_row, flight_from_row, flight_values,
+    get_statement, search_flights_statement, select_flight_statement, select_flights_statement
+)
 from database.neo4j import get_neo4j_session
+from services.cache import MISSING, flight_cache
+from services.connections import connection_index
+from services.graph_outbox import confirm_flight_change, record_flight_change
+from services.singleflight import flight_lookups
+from services import ticket_stats
+from utils.bulk import iter_chunks, iter_request_items
+from utils.pagination import decode_paging_state, encode_paging_state
+from utils.projection import parse_fields
+import asyncio
+import json
 import logging
+import os
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -13,193 +34,323 @@ router = APIRouter(
     tags=["Flights"]
 )
 
+# Настройки массовой загрузки
+FLIGHTS_BULK_CONCURRENCY = int(os.getenv("FLIGHTS_BULK_CONCURRENCY", "64"))
+FLIGHTS_BULK_CHUNK_SIZE = int(os.getenv("FLIGHTS_BULK_CHUNK_SIZE", "1000"))
+
+# Размер страницы списка рейсов
+FLIGHTS_PAGE_DEFAULT_SIZE = int(os.getenv("FLIGHTS_PAGE_DEFAULT_SIZE", "100"))
+FLIGHTS_PAGE_MAX_SIZE = int(os.getenv("FLIGHTS_PAGE_MAX_SIZE", "1000"))
+
 # CRUD операции
 
 @router.post("/", response_model=Flight)
-def create_flight(flight: Flight):
+async def create_flight(flight: Flight):
     logger.info(f"Создание рейса с номером: {flight.FlightNumber}")
-    # Проверка уникальности FlightNumber
-    query = "SELECT flightnumber FROM flights WHERE flightnumber = %s"
-    result = cassandra_session.execute(query, (flight.FlightNumber,))
-    if result.one():
+    # Связи в Neo4j синхронизируются фоновым обработчиком outbox; событие
+    # записывается до рейса, чтобы применённая запись не осталась без него
+    await record_flight_change(flight.FlightNumber)
+    # Условная вставка: проверка уникальности FlightNumber и запись за один запрос
+    insert_result = await execute_async(get_statement("insert_flight"), flight_values(flight), endpoint="create_flight")
+    if not insert_result.was_applied:
         raise HTTPException(status_code=400, detail="FlightNumber уже существует")
     
-    insert_query = """
-        INSERT INTO flights (
-            flightnumber,
-            scheduleddeparturetime,
-            scheduledarrivaltime,
-            actualdeparturetime,
-            actualarrivaltime,
-            flightstatus,
-            airlineid,
-            aircraftid,
-            routeid
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    # Рейс уже записан: дальнейшие шаги не меняют ответ, их ошибки только
+    # записываются в журнал (счётчики исправит сверка, индекс — обновление)
+    try:
+        connection_index.flight_changed(flight.FlightNumber, flight)
+    except Exception as e:
+        logger.error(f"Ошибка обновления индекса стыковок для рейса {flight.FlightNumber}: {e}")
+    await asyncio.gather(ticket_stats.flights_changed(1), confirm_flight_change(flight.FlightNumber))
+    
+    return flight
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_flights_bulk(request: Request):
     """
-    cassandra_session.execute(insert_query, (
-        flight.FlightNumber,
-        flight.ScheduledDepartureTime,
-        flight.ScheduledArrivalTime,
-        flight.ActualDepartureTime,
-        flight.ActualArrivalTime,
-        flight.FlightStatus,
-        flight.AirlineID,
-        flight.AircraftID,
-        flight.RouteID
-    ))
+    Массовая загрузка рейсов из JSON-массива или NDJSON-потока.
+
+    Рейсы обрабатываются частями, вставки в Cassandra выполняются параллельно
+    (не более FLIGHTS_BULK_CONCURRENCY одновременно). Связи созданных рейсов
+    попадают в Neo4j через outbox, который применяет их пачками.
+    """
+    logger.info("Массовая загрузка рейсов")
+    semaphore = asyncio.Semaphore(FLIGHTS_BULK_CONCURRENCY)
+    items = []
+    async for chunk in iter_chunks(iter_request_items(request), FLIGHTS_BULK_CHUNK_SIZE):
+        items.extend(await _create_flights_chunk(chunk, semaphore))
     
-    # Дополнительно: создание связи в Neo4j (wrapper метод)
-    with get_neo4j_session() as neo_session:
-        cypher_query = """
-            MATCH (a:Airline {AirlineID: $airline_id}),
-                  (ac:Aircraft {AircraftID: $aircraft_id}),
-                  (r:Route {RouteID: $route_id}),
-                  (f:Flight {FlightNumber: $flight_number})
-            MERGE (f)-[:OPERATED_BY]->(ac)
-            MERGE (f)-[:AFFILIATED_WITH]->(a)
-            MERGE (f)-[:HAS_ROUTE]->(r)
-        """
-        neo_session.run(cypher_query, 
-                        airline_id=flight.AirlineID,
-                        aircraft_id=flight.AircraftID,
-                        route_id=flight.RouteID,
-                        flight_number=flight.FlightNumber)
+    succeeded = sum(1 for item in items if item.Status == "created")
+    logger.info(f"Загружено рейсов: {succeeded} из {len(items)}")
+    return BulkResult(Total=len(items), Succeeded=succeeded, Failed=len(items) - succeeded, Items=items)
+
+async def _create_flights_chunk(chunk, semaphore):
+    results = {}
+    flights = []
+    seen = set()
+    for index, data in chunk:
+        if isinstance(data, json.JSONDecodeError):
+            results[index] = BulkItemResult(Index=index, Status="invalid", Detail=f"Некорректный JSON: {data.msg}")
+            continue
+        try:
+            flight = Flight.model_validate(data)
+        except ValidationError as e:
+            flight_number = data.get("FlightNumber") if isinstance(data, dict) else None
+            results[index] = BulkItemResult(Index=index, ID=flight_number, Status="invalid", Detail=str(e))
+            continue
+        # Повтор номера внутри части не отправляется в Cassandra: вставки идут
+        # параллельно, и иначе «duplicate» мог бы получить любой из них
+        if flight.FlightNumber in seen:
+            results[index] = BulkItemResult(Index=index, ID=flight.FlightNumber, Status="duplicate", Detail="FlightNumber уже существует")
+            continue
+        seen.add(flight.FlightNumber)
+        flights.append((index, flight))
     
-    return flight
+    async def insert(index, flight):
+        async with semaphore:
+            try:
+                await record_flight_change(flight.FlightNumber)
+                insert_result = await execute_async(
+                    get_statement("insert_flight"),
+                    flight_values(flight),
+                    endpoint="create_flights_bulk"
+                )
+                if not insert_result.was_applied:
+                    return BulkItemResult(Index=index, ID=flight.FlightNumber, Status="duplicate", Detail="FlightNumber уже существует")
+                connection_index.flight_changed(flight.FlightNumber, flight)
+                await confirm_flight_change(flight.FlightNumber)
+            except Exception as e:
+                logger.error(f"Ошибка при вставке рейса {flight.FlightNumber}: {e}")
+                return BulkItemResult(Index=index, ID=flight.FlightNumber, Status="error", Detail=str(e))
+        return BulkItemResult(Index=index, ID=flight.FlightNumber, Status="created")
+    
+    for item in await asyncio.gather(*(insert(index, flight) for index, flight in flights)):
+        results[item.Index] = item
+    # Счётчик рейсов обновляется один раз на пачку
+    await ticket_stats.flights_changed(sum(1 for item in results.values() if item.Status == "created"))
+    
+    return [results[index] for index in sorted(results)]
+
+@router.get("/")
+async def list_flights(
+    response: Response,
+    limit: int = Query(FLIGHTS_PAGE_DEFAULT_SIZE, ge=1, le=FLIGHTS_PAGE_MAX_SIZE),
+    next_token: Optional[str] = Query(None, alias="next"),
+    fields: Optional[str] = None
+):
+    """
+    Постраничный список рейсов.
+
+    Каждая страница — отдельный запрос к Cassandra с fetch_size = limit,
+    поэтому таблица никогда не читается целиком. Если есть следующая
+    страница, её токен (paging_state драйвера) возвращается в заголовке
+    X-Next-Token и передаётся в параметре next. Параметр fields задаёт
+    список возвращаемых полей через запятую; FlightNumber включается всегда.
+    """
+    logger.info("Получение списка рейсов")
+    selected = parse_fields(fields, FLIGHT_FIELDS, required=("FlightNumber",))
+    statement = select_flights_statement([FLIGHT_FIELDS[field] for field in selected]).bind(())
+    return await _fetch_flights_page(statement, selected, limit, next_token, "list_flights", response)
+
+@router.get("/search")
+async def search_flights(
+    response: Response,
+    status: Optional[str] = None,
+    airline: Optional[str] = None,
+    aircraft: Optional[str] = None,
+    route: Optional[str] = None,
+    departure_from: Optional[datetime] = None,
+    departure_to: Optional[datetime] = None,
+    limit: int = Query(FLIGHTS_PAGE_DEFAULT_SIZE, ge=1, le=FLIGHTS_PAGE_MAX_SIZE),
+    next_token: Optional[str] = Query(None, alias="next"),
+    fields: Optional[str] = None
+):
+    """
+    Поиск рейсов по статусу, авиакомпании, самолёту, маршруту и интервалу
+    вылета по расписанию [departure_from, departure_to).
+
+    Все условия проверяются одним запросом к Cassandra по индексам SAI
+    (см. FLIGHT_SEARCH_COLUMNS в database/cassandra.py). Выдача постраничная,
+    как у списка рейсов; порядок рейсов не определён.
+    """
+    logger.info(
+        f"Поиск рейсов: статус {status}, авиакомпания {airline}, самолёт {aircraft}, маршрут {route}, "
+        f"вылет с {departure_from} по {departure_to}"
+    )
+    filters = [
+        ("flightstatus = ?", status),
+        ("airlineid = ?", airline),
+        ("aircraftid = ?", aircraft),
+        ("routeid = ?", route),
+        ("scheduleddeparturetime >= ?", departure_from),
+        ("scheduleddeparturetime < ?", departure_to),
+    ]
+    filters = [(condition, value) for condition, value in filters if value is not None]
+    if not filters:
+        # Без условий это полный просмотр таблицы, для него есть GET /flights/
+        raise HTTPException(status_code=400, detail="Укажите хотя бы одно условие поиска")
+    if departure_from is not None and departure_to is not None and departure_from >= departure_to:
+        raise HTTPException(status_code=400, detail="departure_from должен быть раньше departure_to")
+    
+    selected = parse_fields(fields, FLIGHT_FIELDS, required=("FlightNumber",))
+    statement = search_flights_statement(
+        [FLIGHT_FIELDS[field] for field in selected],
+        [condition for condition, _ in filters]
+    ).bind([value for _, value in filters])
+    return await _fetch_flights_page(statement, selected, limit, next_token, "search_flights", response)
+
+async def _fetch_flights_page(statement, selected, limit, next_token, endpoint, response):
+    statement.fetch_size = limit
+    paging_state = decode_paging_state(next_token) if next_token is not None else None
+    try:
+        result = await execute_async(
+            statement,
+            endpoint=endpoint,
+            execution_profile=PROFILE_READ,
+            paging_state=paging_state
+        )
+    except (InvalidRequest, ProtocolException):
+        # Cassandra отклоняет paging_state, не относящийся к этому запросу
+        # (InvalidRequest), и байты, которые не разбираются как paging_state
+        # (ProtocolException); без токена эти ошибки не связаны с клиентом
+        if paging_state is None:
+            raise
+        raise HTTPException(status_code=400, detail="Некорректный токен страницы")
+    
+    if result.paging_state:
+        response.headers["X-Next-Token"] = encode_paging_state(result.paging_state)
+    # Только текущая страница: итерация по ResultSet запросила бы следующие
+    return [jsonable_encoder(flight_fields_from_row(row, selected)) for row in result.current_rows]
+
+# Статистика билетов читается из счётчиков (services/ticket_stats.py) одной
+# строкой; маршруты объявлены до /{flight_number}, чтобы не совпадать с ним
+
+@router.get("/average_tickets", response_model=float)
+async def get_average_tickets_per_flight():
+    logger.info(f"Получение среднего количества билетов на рейс")
+    tickets, flights = await ticket_stats.get_ticket_totals("get_average_tickets_per_flight")
+    if flights <= 0:
+        return 0.0
+    return tickets / flights
+
+@router.get("/{flight_number}/tickets/count", response_model=int)
+async def get_flight_ticket_count(flight_number: str):
+    logger.info(f"Получение количества билетов на рейс {flight_number}")
+    return await ticket_stats.get_flight_ticket_count(flight_number, "get_flight_ticket_count")
+
+async def _load_flight(flight_number: str):
+    result = await execute_async(
+        get_statement("select_flight"),
+        (flight_number,),
+        endpoint="get_flight",
+        execution_profile=PROFILE_READ
+    )
+    flight = result.one()
+    return flight_from_row(flight) if flight else None
+
+async def _load_flight_fields(flight_number: str, fields):
+    # Из кэша, если рейс там есть, иначе только выбранные колонки из Cassandra
+    cached = await flight_cache.get(flight_number)
+    if cached is not MISSING:
+        return {field: getattr(cached, field) for field in fields}
+    result = await execute_async(
+        select_flight_statement([FLIGHT_FIELDS[field] for field in fields]),
+        (flight_number,),
+        endpoint="get_flight",
+        execution_profile=PROFILE_READ
+    )
+    row = result.one()
+    return flight_fields_from_row(row, fields) if row else None
 
 @router.get("/{flight_number}", response_model=Flight)
-def get_flight(flight_number: str):
+async def get_flight(flight_number: str, fields: Optional[str] = None):
     logger.info(f"Получение рейса с номером: {flight_number}")
-    query = "SELECT * FROM flights WHERE flightnumber = %s"
-    result = cassandra_session.execute(query, (flight_number,))
-    flight = result.one()
+    if fields:
+        # Частичный ответ возвращается без валидации моделью Flight
+        selected = parse_fields(fields, FLIGHT_FIELDS, required=("FlightNumber",))
+        flight = await _load_flight_fields(flight_number, selected)
+        if not flight:
+            raise HTTPException(status_code=404, detail="Рейс не найден")
+        return JSONResponse(jsonable_encoder(flight))
+    
+    # Промахи кэша по одному номеру рейса объединяются в один запрос к Cassandra
+    flight = await flight_cache.get_or_load(
+        flight_number,
+        lambda: flight_lookups.do(flight_number, lambda: _load_flight(flight_number))
+    )
     if not flight:
         raise HTTPException(status_code=404, detail="Рейс не найден")
     
-    return Flight(
-        FlightNumber=flight.flightnumber,
-        ScheduledDepartureTime=flight.scheduleddeparturetime,
-        ScheduledArrivalTime=flight.scheduledarrivaltime,
-        ActualDepartureTime=flight.actualdeparturetime,
-        ActualArrivalTime=flight.actualarrivaltime,
-        FlightStatus=flight.flightstatus,
-        AirlineID=flight.airlineid,
-        AircraftID=flight.aircraftid,
-        RouteID=flight.routeid
-    )
+    return flight
 
 @router.put("/{flight_number}", response_model=Flight)
-def update_flight(flight_number: str, flight: Flight):
+async def update_flight(flight_number: str, flight: Flight):
     logger.info(f"Обновление рейса с номером: {flight_number}")
-    update_query = """
-        UPDATE flights
-        SET 
-            scheduleddeparturetime = ?,
-            scheduledarrivaltime = ?,
-            actualdeparturetime = ?,
-            actualarrivaltime = ?,
-            flightstatus = ?,
-            airlineid = ?,
-            aircraftid = ?,
-            routeid = ?
-        WHERE flightnumber = ?
-    """
-    update_result = cassandra_session.execute(update_query, (
-        flight.ScheduledDepartureTime,
-        flight.ScheduledArrivalTime,
-        flight.ActualDepartureTime,
-        flight.ActualArrivalTime,
-        flight.FlightStatus,
-        flight.AirlineID,
-        flight.AircraftID,
-        flight.RouteID,
-        flight_number
-    ))
+    # Связи в Neo4j обновит фоновый обработчик outbox
+    await record_flight_change(flight_number)
+    update_result = await execute_async(
+        get_statement("update_flight"),
+        flight_values(flight)[1:] + (flight_number,),
+        endpoint="update_flight"
+    )
     
     if not update_result.was_applied:
         raise HTTPException(status_code=404, detail="Рейс не найден")
-    
-    # Обновление связей в Neo4j (wrapper метод)
-    with get_neo4j_session() as neo_session:
-        cypher_query = """
-            MATCH (f:Flight {FlightNumber: $flight_number})
-            OPTIONAL MATCH (f)-[:AFFILIATED_WITH]->(a:Airline)
-            OPTIONAL MATCH (f)-[:OPERATED_BY]->(ac:Aircraft)
-            OPTIONAL MATCH (f)-[:HAS_ROUTE]->(r:Route)
-            SET f.FlightStatus = $flight_status
-            WITH f, a, ac, r
-            MERGE (a_new:Airline {AirlineID: $airline_id})
-            MERGE (ac_new:Aircraft {AircraftID: $aircraft_id})
-            MERGE (r_new:Route {RouteID: $route_id})
-            MERGE (f)-[:AFFILIATED_WITH]->(a_new)
-            MERGE (f)-[:OPERATED_BY]->(ac_new)
-            MERGE (f)-[:HAS_ROUTE]->(r_new)
-            DELETE f-[:AFFILIATED_WITH]->(a)
-            DELETE f-[:OPERATED_BY]->(ac)
-            DELETE f-[:HAS_ROUTE]->(r)
-        """
-        neo_session.run(cypher_query, 
-                        flight_number=flight_number,
-                        flight_status=flight.FlightStatus,
-                        airline_id=flight.AirlineID,
-                        aircraft_id=flight.AircraftID,
-                        route_id=flight.RouteID)
+    flight_lookups.forget(flight_number)
+    await flight_cache.delete(flight_number)
+    connection_index.flight_changed(flight_number, flight)
+    await confirm_flight_change(flight_number)
     
     return flight
 
 @router.delete("/{flight_number}")
-def delete_flight(flight_number: str):
+async def delete_flight(flight_number: str):
     logger.info(f"Удаление рейса с номером: {flight_number}")
-    delete_query = "DELETE FROM flights WHERE flightnumber = ?"
-    delete_result = cassandra_session.execute(delete_query, (flight_number,))
+    # Узел рейса в Neo4j удалит фоновый обработчик outbox
+    await record_flight_change(flight_number)
+    delete_result = await execute_async(get_statement("delete_flight"), (flight_number,), endpoint="delete_flight")
     if delete_result.was_applied:
-        # Удаление связей в Neo4j (wrapper метод)
-        with get_neo4j_session() as neo_session:
-            cypher_query = """
-                MATCH (f:Flight {FlightNumber: $flight_number})
-                DETACH DELETE f
-            """
-            neo_session.run(cypher_query, flight_number=flight_number)
+        flight_lookups.forget(flight_number)
+        await flight_cache.delete(flight_number)
+        connection_index.flight_deleted(flight_number)
+        await ticket_stats.flight_deleted(flight_number)
+        await confirm_flight_change(flight_number)
         return {"detail": "Рейс удалён"}
     else:
         raise HTTPException(status_code=404, detail="Рейс не найден")
 
 # Дополнительные методы "обертки"
 
+async def _fetch_passenger_flights(tx, passenger_id: str, fields=None):
+    # Имена полей проверены parse_fields, поэтому их можно подставить в проекцию
+    projection = f"f {{{', '.join(f'.{field}' for field in fields)}}}" if fields else "f"
+    query = f"""
+        MATCH (p:Passenger {{PassengerID: $passenger_id}})-[:REGISTERED_ON]->(f:Flight)
+        RETURN {projection} AS f
+    """
+    result = await tx.run(query, passenger_id=passenger_id)
+    return [record["f"] async for record in result]
+
 @router.get("/passenger/{passenger_id}", response_model=List[Flight])
-def get_flights_by_passenger(passenger_id: str):
+async def get_flights_by_passenger(passenger_id: str, fields: Optional[str] = None):
     logger.info(f"Получение рейсов для пассажира с ID: {passenger_id}")
-    query = """
-        MATCH (p:Passenger {PassengerID: $passenger_id})-[:REGISTERED_ON]->(f:Flight)
-        RETURN f
-    """
-    with get_neo4j_session() as neo_session:
-        result = neo_session.run(query, passenger_id=passenger_id)
-        flights = []
-        for record in result:
-            f = record["f"]
-            flights.append(Flight(
-                FlightNumber=f["FlightNumber"],
-                ScheduledDepartureTime=f["ScheduledDepartureTime"],
-                ScheduledArrivalTime=f["ScheduledArrivalTime"],
-                ActualDepartureTime=f.get("ActualDepartureTime"),
-                ActualArrivalTime=f.get("ActualArrivalTime"),
-                FlightStatus=f["FlightStatus"],
-                AirlineID=f["AirlineID"],
-                AircraftID=f["AircraftID"],
-                RouteID=f["RouteID"]
-            ))
+    selected = parse_fields(fields, FLIGHT_FIELDS, required=("FlightNumber",)) if fields else None
+    # Управляемая транзакция чтения: при сбое узла драйвер повторит её на другом
+    async with get_neo4j_session("get_flights_by_passenger") as neo_session:
+        records = await neo_session.execute_read(_fetch_passenger_flights, passenger_id, selected)
+    if selected:
+        return JSONResponse(jsonable_encoder(records))
+    flights = []
+    for f in records:
+        flights.append(Flight(
+            FlightNumber=f["FlightNumber"],
+            ScheduledDepartureTime=f["ScheduledDepartureTime"],
+            ScheduledArrivalTime=f["ScheduledArrivalTime"],
+            ActualDepartureTime=f.get("ActualDepartureTime"),
+            ActualArrivalTime=f.get("ActualArrivalTime"),
+            FlightStatus=f["FlightStatus"],
+            AirlineID=f["AirlineID"],
+            AircraftID=f["AircraftID"],
+            RouteID=f["RouteID"]
+        ))
     return flights
-
-@router.get("/average_tickets", response_model=float)
-def get_average_tickets_per_flight():
-    logger.info(f"Получение среднего количества билетов на рейс")
-    # Пример использования функции (если была создана пользовательская функция в Cassandra)
-    query = "SELECT airportflightmanagement.avg_tickets_per_flight() AS average"
-    result = cassandra_session.execute(query)
-    row = result.one()
-    if row and row.average is not None:
-        return row.average
-    else:
-        raise HTTPException(status_code=500, detail="Не удалось вычислить среднее количество билетов")
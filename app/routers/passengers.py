@@ -1,10 +1,21 @@
-from fastapi import APIRouter, HTTPException
-from pymongo.errors import PyMongoError
-from typing import List
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from typing import List, Literal, Optional
+import json
 import logging
-from models.passenger import Passenger
-from database.mongodb import passengers_collection
+import os
+from models.bulk import BulkItemResult, BulkResult
+from models.passenger import Baggage, BaggageUpdate, Passenger, Ticket, TicketUpdate
+from database.mongodb import get_passengers_collection
+from services.singleflight import passenger_lookups
+from services.ticket_stats import tickets_changed
 from fastapi.encoders import jsonable_encoder  # Добавлен импорт
+from utils.bulk import iter_chunks, iter_request_items
+from utils.pagination import NDJSON_MEDIA_TYPE, decode_page_token, encode_page_token, iter_ndjson, ndjson_requested
+from utils.projection import mongo_projection, parse_fields
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,6 +25,22 @@ router = APIRouter(
     tags=["Passengers"]
 )
 
+# Размер пачки документов для insert_many при массовой загрузке
+PASSENGERS_BULK_CHUNK_SIZE = int(os.getenv("PASSENGERS_BULK_CHUNK_SIZE", "1000"))
+
+# Код ошибки MongoDB при нарушении уникального индекса
+DUPLICATE_KEY_ERROR = 11000
+
+# Размер страницы для поиска по числу билетов
+MIN_TICKETS_DEFAULT_LIMIT = int(os.getenv("MIN_TICKETS_DEFAULT_LIMIT", "100"))
+MIN_TICKETS_MAX_LIMIT = int(os.getenv("MIN_TICKETS_MAX_LIMIT", "1000"))
+# Число документов, получаемых курсором MongoDB за один запрос к серверу
+PASSENGERS_CURSOR_BATCH_SIZE = int(os.getenv("PASSENGERS_CURSOR_BATCH_SIZE", "500"))
+
+# Ключ сортировки поиска по числу билетов (совпадает с индексом
+# TicketCount_1_PassengerID_1) и типы его значений в токене страницы
+MIN_TICKETS_SORT_KEYS = {"TicketCount": int, "PassengerID": str}
+
 # Преобразование MongoDB документа в Pydantic модель
 def passenger_helper(passenger) -> Passenger:
     return Passenger(
@@ -28,74 +55,302 @@ def passenger_helper(passenger) -> Passenger:
         Tickets=passenger["Tickets"]
     )
 
+def passenger_view(passenger, fields=None):
+    # С выбором полей возвращается частичный документ без валидации моделью
+    if fields is None:
+        return passenger_helper(passenger)
+    return {field: passenger.get(field) for field in fields}
+
+def parse_passenger_fields(fields):
+    if not fields:
+        return None
+    return parse_fields(fields, Passenger.model_fields, required=("PassengerID",))
+
+def passenger_document(passenger: Passenger) -> dict:
+    # TicketCount хранится вместе с билетами, чтобы поиск по числу билетов
+    # шёл по индексу, а не вычислял $size для каждого документа
+    document = passenger.model_dump(mode="json")
+    document["TicketCount"] = len(passenger.Tickets)
+    return document
+
 # CRUD операции
 @router.post("/", response_model=Passenger)
-def create_passenger(passenger: Passenger):
+async def create_passenger(passenger: Passenger):
     logger.info(f"Создание пассажира с ID: {passenger.PassengerID}")
-    # Проверка уникальности PassengerID
-    if passengers_collection.find_one({"PassengerID": passenger.PassengerID}):
-        raise HTTPException(status_code=400, detail="PassengerID уже существует")
-    
+    passengers_collection = get_passengers_collection("create_passenger")
     try:
-        # Использование jsonable_encoder для преобразования данных
-        passenger_dict = jsonable_encoder(passenger.dict())
-        passengers_collection.insert_one(passenger_dict)
-        return passenger
+        passenger_dict = passenger_document(passenger)
+        # Уникальность PassengerID обеспечивается уникальным индексом
+        await passengers_collection.insert_one(passenger_dict)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="PassengerID уже существует")
     except PyMongoError as e:
         logger.error(f"Ошибка при вставке пассажира: {e}")
         raise HTTPException(status_code=500, detail="Ошибка при вставке пассажира в базу данных")
+    await tickets_changed((), passenger.Tickets)
+    return passenger
+
+@router.post("/bulk", response_model=BulkResult)
+async def create_passengers_bulk(request: Request):
+    """
+    Массовая загрузка пассажиров из NDJSON-потока или JSON-массива.
+
+    Строки читаются и валидируются пачками по PASSENGERS_BULK_CHUNK_SIZE,
+    каждая пачка записывается одним неупорядоченным insert_many.
+    Ошибки валидации и дубликаты PassengerID возвращаются по каждой строке.
+    """
+    logger.info("Массовая загрузка пассажиров")
+    items = []
+    async for chunk in iter_chunks(iter_request_items(request), PASSENGERS_BULK_CHUNK_SIZE):
+        items.extend(await _create_passengers_chunk(chunk))
+    
+    succeeded = sum(1 for item in items if item.Status == "created")
+    logger.info(f"Загружено пассажиров: {succeeded} из {len(items)}")
+    return BulkResult(Total=len(items), Succeeded=succeeded, Failed=len(items) - succeeded, Items=items)
+
+async def _create_passengers_chunk(chunk):
+    passengers_collection = get_passengers_collection("create_passengers_bulk")
+    results = {}
+    documents = []
+    for index, data in chunk:
+        if isinstance(data, json.JSONDecodeError):
+            results[index] = BulkItemResult(Index=index, Status="invalid", Detail=f"Некорректный JSON: {data.msg}")
+            continue
+        try:
+            passenger = Passenger.model_validate(data)
+        except ValidationError as e:
+            passenger_id = data.get("PassengerID") if isinstance(data, dict) else None
+            results[index] = BulkItemResult(Index=index, ID=passenger_id, Status="invalid", Detail=str(e))
+            continue
+        documents.append((index, passenger_document(passenger)))
+        results[index] = BulkItemResult(Index=index, ID=passenger.PassengerID, Status="created")
+    
+    if documents:
+        try:
+            await passengers_collection.insert_many([document for _, document in documents], ordered=False)
+        except BulkWriteError as e:
+            # Индексы ошибок относятся к позициям в переданной пачке
+            for error in e.details.get("writeErrors", []):
+                index = documents[error["index"]][0]
+                if error.get("code") == DUPLICATE_KEY_ERROR:
+                    results[index].Status = "duplicate"
+                    results[index].Detail = "PassengerID уже существует"
+                else:
+                    results[index].Status = "error"
+                    results[index].Detail = error.get("errmsg")
+        except PyMongoError as e:
+            logger.error(f"Ошибка при массовой вставке пассажиров: {e}")
+            for index, _ in documents:
+                results[index].Status = "error"
+                results[index].Detail = "Ошибка при вставке пассажира в базу данных"
+        # Счётчики обновляются один раз на пачку по всем вставленным пассажирам
+        await tickets_changed((), [
+            ticket
+            for index, document in documents if results[index].Status == "created"
+            for ticket in document["Tickets"]
+        ])
+    
+    return [results[index] for index in sorted(results)]
 
 @router.get("/{passenger_id}", response_model=Passenger)
-def get_passenger(passenger_id: str):
+async def get_passenger(passenger_id: str, fields: Optional[str] = None):
     logger.info(f"Получение пассажира с ID: {passenger_id}")
-    passenger = passengers_collection.find_one({"PassengerID": passenger_id})
+    passengers_collection = get_passengers_collection("get_passenger")
+    selected = parse_passenger_fields(fields)
+    # Проекция выполняется в MongoDB: лишние поля (например, Tickets) не передаются
+    projection = mongo_projection(selected) if selected else None
+    # Одновременные запросы одного пассажира объединяются в один запрос к MongoDB
+    passenger = await passenger_lookups.do(
+        (passenger_id, tuple(selected or ())),
+        lambda: passengers_collection.find_one({"PassengerID": passenger_id}, projection)
+    )
     if not passenger:
         raise HTTPException(status_code=404, detail="Пассажир не найден")
+    if selected:
+        return JSONResponse(jsonable_encoder(passenger_view(passenger, selected)))
     return passenger_helper(passenger)
 
+def _forget_passenger_lookups(passenger_id: str):
+    # Ключ запроса — пара (PassengerID, выбранные поля)
+    passenger_lookups.forget_matching(lambda key: key[0] == passenger_id)
+
 @router.put("/{passenger_id}", response_model=Passenger)
-def update_passenger(passenger_id: str, passenger: Passenger):
+async def update_passenger(passenger_id: str, passenger: Passenger):
     logger.info(f"Обновление пассажира с ID: {passenger_id}")
-    update_result = passengers_collection.update_one(
+    passengers_collection = get_passengers_collection("update_passenger")
+    changes = passenger.dict(exclude_unset=True)
+    if "Tickets" in changes:
+        changes["TicketCount"] = len(passenger.Tickets)
+    # Билеты до изменения нужны для счётчиков билетов по рейсам
+    previous = await passengers_collection.find_one_and_update(
         {"PassengerID": passenger_id},
-        {"$set": passenger.dict(exclude_unset=True)}
+        {"$set": changes},
+        projection={"_id": 0, "Tickets": 1},
+        return_document=ReturnDocument.BEFORE
     )
-    if update_result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Пассажир не найден")
+    _forget_passenger_lookups(passenger_id)
+    if "Tickets" in changes:
+        await tickets_changed(previous.get("Tickets"), passenger.Tickets)
     
-    updated_passenger = passengers_collection.find_one({"PassengerID": passenger_id})
+    updated_passenger = await passengers_collection.find_one({"PassengerID": passenger_id})
     return passenger_helper(updated_passenger)
 
 @router.delete("/{passenger_id}")
-def delete_passenger(passenger_id: str):
+async def delete_passenger(passenger_id: str):
     logger.info(f"Удаление пассажира с ID: {passenger_id}")
-    delete_result = passengers_collection.delete_one({"PassengerID": passenger_id})
-    if delete_result.deleted_count == 0:
+    passengers_collection = get_passengers_collection("delete_passenger")
+    deleted = await passengers_collection.find_one_and_delete(
+        {"PassengerID": passenger_id},
+        projection={"_id": 0, "Tickets": 1}
+    )
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Пассажир не найден")
+    _forget_passenger_lookups(passenger_id)
+    await tickets_changed(deleted.get("Tickets"), ())
     return {"detail": "Пассажир удалён"}
 
+# Билеты и багаж пассажира: чтение и обновление отдельных элементов массива Tickets
+
+def _ticket_changes(path: str, changes: dict, model) -> dict:
+    if not changes:
+        raise HTTPException(status_code=400, detail="Нет полей для обновления")
+    # Все поля модели обновления необязательны, но явный null для поля,
+    # обязательного в model, испортил бы документ: его уже не прочитать
+    nulls = [field for field, value in changes.items() if value is None and model.model_fields[field].is_required()]
+    if nulls:
+        raise HTTPException(status_code=400, detail=f"Поля не могут быть null: {', '.join(nulls)}")
+    return {f"{path}.{field}": value for field, value in jsonable_encoder(changes).items()}
+
+@router.get("/{passenger_id}/tickets/{ticket_number}", response_model=Ticket)
+async def get_ticket(passenger_id: str, ticket_number: str):
+    logger.info(f"Получение билета {ticket_number} пассажира с ID: {passenger_id}")
+    passengers_collection = get_passengers_collection("get_ticket")
+    # $elemMatch возвращает только найденный билет, а не весь массив
+    passenger = await passengers_collection.find_one(
+        {"PassengerID": passenger_id, "Tickets.TicketNumber": ticket_number},
+        {"_id": 0, "Tickets": {"$elemMatch": {"TicketNumber": ticket_number}}}
+    )
+    if not passenger:
+        raise HTTPException(status_code=404, detail="Билет не найден")
+    return passenger["Tickets"][0]
+
+@router.patch("/{passenger_id}/tickets/{ticket_number}", response_model=Ticket)
+async def update_ticket(passenger_id: str, ticket_number: str, ticket: TicketUpdate):
+    logger.info(f"Обновление билета {ticket_number} пассажира с ID: {passenger_id}")
+    passengers_collection = get_passengers_collection("update_ticket")
+    changes = ticket.model_dump(exclude_unset=True)
+    # Позиционный оператор $ изменяет билет, найденный условием запроса.
+    # Тот же запрос возвращает билет до изменения: по нему обновляются
+    # счётчики (отмена или перенос на другой рейс), а ответ собирается
+    # из него и применённых изменений
+    passenger = await passengers_collection.find_one_and_update(
+        {"PassengerID": passenger_id, "Tickets.TicketNumber": ticket_number},
+        {"$set": _ticket_changes("Tickets.$", changes, Ticket)},
+        projection={"_id": 0, "Tickets": {"$elemMatch": {"TicketNumber": ticket_number}}},
+        return_document=ReturnDocument.BEFORE
+    )
+    if not passenger:
+        raise HTTPException(status_code=404, detail="Билет не найден")
+    _forget_passenger_lookups(passenger_id)
+    previous = passenger["Tickets"][0]
+    updated = {**previous, **jsonable_encoder(changes)}
+    await tickets_changed([previous], [updated])
+    return updated
+
+@router.get("/{passenger_id}/baggage/{baggage_number}", response_model=Baggage)
+async def get_baggage(passenger_id: str, baggage_number: str):
+    logger.info(f"Получение багажа {baggage_number} пассажира с ID: {passenger_id}")
+    passengers_collection = get_passengers_collection("get_baggage")
+    passenger = await passengers_collection.find_one(
+        {"PassengerID": passenger_id, "Tickets.Baggage.BaggageNumber": baggage_number},
+        {"_id": 0, "Tickets": {"$elemMatch": {"Baggage.BaggageNumber": baggage_number}}}
+    )
+    if not passenger:
+        raise HTTPException(status_code=404, detail="Багаж не найден")
+    return passenger["Tickets"][0]["Baggage"]
+
+@router.patch("/{passenger_id}/baggage/{baggage_number}", response_model=Baggage)
+async def update_baggage(passenger_id: str, baggage_number: str, baggage: BaggageUpdate):
+    logger.info(f"Обновление багажа {baggage_number} пассажира с ID: {passenger_id}")
+    passengers_collection = get_passengers_collection("update_baggage")
+    # arrayFilters выбирает билет с нужным багажом; документ пассажира
+    # не передаётся целиком ни в запросе, ни в ответе
+    passenger = await passengers_collection.find_one_and_update(
+        {"PassengerID": passenger_id, "Tickets.Baggage.BaggageNumber": baggage_number},
+        {"$set": _ticket_changes("Tickets.$[ticket].Baggage", baggage.model_dump(exclude_unset=True), Baggage)},
+        projection={"_id": 0, "Tickets": {"$elemMatch": {"Baggage.BaggageNumber": baggage_number}}},
+        array_filters=[{"ticket.Baggage.BaggageNumber": baggage_number}],
+        return_document=ReturnDocument.AFTER
+    )
+    if not passenger:
+        raise HTTPException(status_code=404, detail="Багаж не найден")
+    _forget_passenger_lookups(passenger_id)
+    return passenger["Tickets"][0]["Baggage"]
+
 # Дополнительные методы "обертки"
 
 @router.get("/tickets/count/{min_tickets}", response_model=List[Passenger])
-def get_passengers_with_min_tickets(min_tickets: int):
+async def get_passengers_with_min_tickets(
+    request: Request,
+    response: Response,
+    min_tickets: int,
+    limit: Optional[int] = Query(None, ge=1, le=MIN_TICKETS_MAX_LIMIT),
+    next_token: Optional[str] = Query(None, alias="next"),
+    batch_size: int = Query(PASSENGERS_CURSOR_BATCH_SIZE, ge=1, le=10000),
+    output_format: Optional[Literal["json", "ndjson"]] = Query(None, alias="format"),
+    fields: Optional[str] = None
+):
+    """
+    Пассажиры с количеством билетов не менее min_tickets.
+
+    Выдача постраничная по ключу (TicketCount, PassengerID): если страница
+    заполнена, в заголовке X-Next-Token возвращается токен, который передаётся
+    в параметре next для получения следующей страницы. В режиме NDJSON
+    (format=ndjson или Accept: application/x-ndjson) документы отправляются по
+    мере чтения курсора; без limit передаются все найденные пассажиры.
+    Параметр fields ограничивает возвращаемые поля (проекция в MongoDB).
+    """
     logger.info(f"Получение пассажиров с количеством билетов не менее {min_tickets}")
-    pipeline = [
-        {"$match": {"Tickets": {"$exists": True}}},
-        {"$project": {
-            "PassengerID": 1,
-            "LastName": 1,
-            "FirstName": 1,
-            "MiddleName": 1,
-            "DateOfBirth": 1,
-            "ContactInfo": 1,
-            "IsTransit": 1,
-            "SpecialRequirements": 1,
-            "Tickets": 1,
-            "tickets_count": {"$size": "$Tickets"}
-        }},
-        {"$match": {"tickets_count": {"$gte": min_tickets}}}
-    ]
-    
-    passengers = passengers_collection.aggregate(pipeline)
-    logger.info(f"Найдено пассажиров: {passengers.count()}")
+    passengers_collection = get_passengers_collection("get_passengers_with_min_tickets")
+    query = {"TicketCount": {"$gte": min_tickets}}
+    if next_token is not None:
+        position = decode_page_token(next_token, MIN_TICKETS_SORT_KEYS)
+        # Продолжение после последнего документа предыдущей страницы
+        query = {"$and": [query, {"$or": [
+            {"TicketCount": {"$gt": position["TicketCount"]}},
+            {"TicketCount": position["TicketCount"], "PassengerID": {"$gt": position["PassengerID"]}},
+        ]}]}
+    selected = parse_passenger_fields(fields)
+    # Ключ сортировки нужен для токена следующей страницы
+    projection = mongo_projection([*selected, "TicketCount"]) if selected else None
+    # Диапазонный запрос по индексу TicketCount_1_PassengerID_1
+    cursor = passengers_collection.find(query, projection).sort(
+        [(key, 1) for key in MIN_TICKETS_SORT_KEYS]
+    ).batch_size(batch_size)
+
+    if ndjson_requested(request, output_format):
+        if limit is not None:
+            cursor = cursor.limit(limit)
+        return StreamingResponse(iter_ndjson(_iter_passengers(cursor, selected)), media_type=NDJSON_MEDIA_TYPE)
+
+    limit = limit or MIN_TICKETS_DEFAULT_LIMIT
+    passengers = await cursor.limit(limit).to_list(None)
+    logger.info(f"Найдено пассажиров: {len(passengers)}")
+    headers = {}
+    if len(passengers) == limit:
+        last = passengers[-1]
+        headers["X-Next-Token"] = encode_page_token({key: last[key] for key in MIN_TICKETS_SORT_KEYS})
+    if selected:
+        return JSONResponse(jsonable_encoder([passenger_view(p, selected) for p in passengers]), headers=headers)
+    response.headers.update(headers)
     return [passenger_helper(p) for p in passengers]
+
+async def _iter_passengers(cursor, fields=None):
+    try:
+        async for passenger in cursor:
+            yield passenger_view(passenger, fields)
+    finally:
+        # Курсор закрывается и при разрыве соединения клиентом
+        await cursor.close()
@@ -0,0 +1,118 @@
+from fastapi import APIRouter, HTTPException, Query
+from datetime import datetime, timezone
+from typing import List, Literal, Optional
+import logging
+import os
+from models.connection import Connection, ConnectionLeg
+from models.route import Itinerary
+from services.connections import (
+    CONNECTION_MAX_TRANSFERS, CONNECTION_MAX_WAIT_HOURS, CONNECTION_MIN_CONNECTION_MINUTES, connection_index
+)
+from services.route_graph import route_graph_service
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/routes",
+    tags=["Routes"]
+)
+
+# Максимальное число альтернативных вариантов в одном запросе
+ROUTE_PATH_MAX_ALTERNATIVES = int(os.getenv("ROUTE_PATH_MAX_ALTERNATIVES", "5"))
+
+@router.get("/path", response_model=List[Itinerary])
+async def find_route_paths(
+    origin: str = Query(..., alias="from"),
+    destination: str = Query(..., alias="to"),
+    weight: Literal["distance", "time"] = "distance",
+    k: int = Query(1, ge=1, le=ROUTE_PATH_MAX_ALTERNATIVES)
+):
+    """
+    Кратчайшие варианты перелёта из from в to по расстоянию или времени в пути.
+
+    Поиск идёт по графу маршрутов в памяти процесса (services/route_graph.py),
+    без обращения к базам данных. k задаёт число альтернативных вариантов.
+    """
+    logger.info(f"Поиск маршрута {origin} -> {destination} по {weight}, вариантов: {k}")
+    graph = route_graph_service.graph
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Граф маршрутов ещё не загружен")
+    for code in (origin, destination):
+        if code not in graph:
+            raise HTTPException(status_code=404, detail=f"Аэропорт {code} не найден в маршрутах")
+    if origin == destination:
+        raise HTTPException(status_code=400, detail="Пункты отправления и назначения совпадают")
+    
+    paths = graph.shortest_paths(origin, destination, weight, k)
+    if not paths:
+        raise HTTPException(status_code=404, detail="Маршрут не найден")
+    return [
+        Itinerary(
+            Routes=path,
+            Distance=sum(route.Distance for route in path),
+            TravelTime=sum(route.TravelTime for route in path)
+        )
+        for path in paths
+    ]
+
+def _connection_from_legs(origin: str, legs, transfers: int) -> Connection:
+    items = []
+    for departure, arrival, destination, flight_number in legs:
+        items.append(ConnectionLeg(
+            FlightNumber=flight_number,
+            Origin=origin,
+            Destination=destination,
+            DepartureTime=datetime.fromtimestamp(departure, timezone.utc),
+            ArrivalTime=datetime.fromtimestamp(arrival, timezone.utc)
+        ))
+        origin = destination
+    return Connection(
+        Legs=items,
+        Transfers=transfers,
+        DepartureTime=items[0].DepartureTime,
+        ArrivalTime=items[-1].ArrivalTime
+    )
+
+@router.get("/connections", response_model=List[Connection])
+async def find_connections(
+    origin: str = Query(..., alias="from"),
+    destination: str = Query(..., alias="to"),
+    departure_after: Optional[datetime] = None,
+    optimize: Literal["arrival", "transfers", "all"] = "arrival",
+    min_connection: int = Query(CONNECTION_MIN_CONNECTION_MINUTES, ge=0, description="Минимальное время стыковки, минуты"),
+    max_transfers: int = Query(CONNECTION_MAX_TRANSFERS, ge=0, le=CONNECTION_MAX_TRANSFERS)
+):
+    """
+    Поиск рейсов со стыковками по расписанию.
+
+    optimize=arrival — самый ранний прилёт, transfers — наименьшее число
+    пересадок (из таких — самый ранний прилёт), all — все Парето-оптимальные
+    варианты. Время без часового пояса считается временем UTC.
+    """
+    logger.info(f"Поиск стыковок {origin} -> {destination}, критерий: {optimize}")
+    schedule = connection_index.schedule
+    if schedule is None:
+        raise HTTPException(status_code=503, detail="Расписание ещё не загружено")
+    if origin == destination:
+        raise HTTPException(status_code=400, detail="Пункты отправления и назначения совпадают")
+    start = departure_after or datetime.now(timezone.utc)
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    
+    options = schedule.search(
+        origin,
+        destination,
+        start.timestamp(),
+        min_connection * 60,
+        max_transfers,
+        CONNECTION_MAX_WAIT_HOURS * 3600
+    )
+    if not options:
+        raise HTTPException(status_code=404, detail="Подходящих рейсов не найдено")
+    # Варианты упорядочены по числу пересадок, последний прилетает раньше всех
+    if optimize == "arrival":
+        options = options[-1:]
+    elif optimize == "transfers":
+        options = options[:1]
+    return [_connection_from_legs(origin, legs, transfers) for transfers, legs in options]
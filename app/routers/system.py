@@ -0,0 +1,62 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from database.manager import connection_manager
+from database.mongo_indexes import index_report
+from database.mongodb import get_db
+from services.cache import flight_cache
+from services.connections import connection_index
+from services.graph_outbox import graph_outbox_worker
+from services.route_graph import route_graph_service
+from services.singleflight import singleflight_stats
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/system",
+    tags=["System"]
+)
+
+@router.get("/health")
+async def get_health():
+    # Проверка жизнеспособности процесса, не зависит от баз данных
+    return {"status": "ok"}
+
+@router.get("/ready")
+async def get_readiness():
+    ready = connection_manager.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "stores": connection_manager.status()}
+    )
+
+@router.get("/outbox")
+async def get_outbox_status():
+    logger.info("Получение состояния outbox синхронизации Neo4j")
+    return await graph_outbox_worker.status()
+
+@router.get("/cache")
+async def get_cache_stats():
+    logger.info("Получение статистики кэша рейсов")
+    return flight_cache.stats()
+
+@router.get("/singleflight")
+async def get_singleflight_stats():
+    logger.info("Получение статистики объединения запросов")
+    return singleflight_stats()
+
+@router.get("/routes")
+async def get_route_graph_stats():
+    logger.info("Получение состояния графа маршрутов")
+    return route_graph_service.stats()
+
+@router.get("/connections")
+async def get_connection_index_stats():
+    logger.info("Получение состояния расписания для поиска стыковок")
+    return connection_index.stats()
+
+@router.get("/indexes")
+async def get_index_report():
+    logger.info("Получение отчёта по индексам MongoDB")
+    return await index_report(get_db())
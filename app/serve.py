@@ -0,0 +1,28 @@
+"""
+Точка входа для запуска API в несколько процессов.
+
+    python serve.py
+
+Число воркеров задаётся переменной API_WORKERS (по умолчанию — число ядер).
+Каждый воркер после запуска сам подключается к базам данных (см.
+database/manager.py), а размеры пулов подключений делятся между воркерами
+поровну из общего бюджета MONGO_POOL_BUDGET и NEO4J_POOL_BUDGET.
+Обработчик outbox запускается в каждом воркере, но каждый шард outbox
+обрабатывает только один из них (см. services/graph_outbox.py).
+"""
+import os
+import uvicorn
+
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS") or os.cpu_count() or 1)
+
+
+def main():
+    # Воркеры наследуют окружение, по нему они рассчитывают свою долю пулов
+    os.environ["API_WORKERS"] = str(API_WORKERS)
+    uvicorn.run("main:app", host=API_HOST, port=API_PORT, workers=API_WORKERS)
+
+
+if __name__ == "__main__":
+    main()
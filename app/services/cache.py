@@ -0,0 +1,135 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import os
+import threading
+import time
+
+# Настройки кэша рейсов
+FLIGHT_CACHE_BACKEND = os.getenv("FLIGHT_CACHE_BACKEND", "memory")
+FLIGHT_CACHE_SIZE = int(os.getenv("FLIGHT_CACHE_SIZE", "10000"))
+FLIGHT_CACHE_TTL = float(os.getenv("FLIGHT_CACHE_TTL", "5"))
+
+# Маркер отсутствия значения (None может быть допустимым значением)
+MISSING = object()
+
+
+class CacheBackend(ABC):
+    """
+    Интерфейс кэша. Методы асинхронные, чтобы общий (внешний) кэш для
+    нескольких воркеров можно было подключить без изменения роутеров.
+    """
+
+    @abstractmethod
+    async def get(self, key):
+        """Значение по ключу или MISSING."""
+
+    @abstractmethod
+    async def set(self, key, value):
+        """Сохраняет значение на время жизни записей бэкенда."""
+
+    @abstractmethod
+    async def delete(self, key):
+        """Удаляет ключ и увеличивает счётчик инвалидаций (см. generation)."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Размер и счётчики попаданий для эндпоинтов состояния."""
+
+    async def get_or_load(self, key, loader):
+        """
+        Read-through: при промахе вызывает loader и сохраняет результат.
+
+        None не кэшируется. Если за время загрузки в кэше была инвалидация,
+        загруженное значение возвращается, но не сохраняется, чтобы не вернуть
+        в кэш данные, прочитанные до записи.
+        """
+        value = await self.get(key)
+        if value is not MISSING:
+            return value
+        generation = self.generation()
+        value = await loader()
+        if value is not None and self.generation() == generation:
+            await self.set(key, value)
+        return value
+
+    def generation(self):
+        """Счётчик инвалидаций; None, если бэкенд его не поддерживает."""
+        return None
+
+
+class InMemoryLRUCache(CacheBackend):
+    """Кэш в памяти процесса с ограниченным размером, LRU-вытеснением и TTL записей."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    async def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    async def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+            self._generation += 1
+            self.invalidations += 1
+
+    def generation(self):
+        return self._generation
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+# Доступные реализации кэша, выбираются переменной FLIGHT_CACHE_BACKEND
+CACHE_BACKENDS = {
+    "memory": InMemoryLRUCache,
+}
+
+
+def create_cache(backend: str, maxsize: int, ttl: float) -> CacheBackend:
+    if backend not in CACHE_BACKENDS:
+        raise ValueError(f"Неизвестный тип кэша: {backend}")
+    return CACHE_BACKENDS[backend](maxsize=maxsize, ttl=ttl)
+
+
+flight_cache = create_cache(FLIGHT_CACHE_BACKEND, FLIGHT_CACHE_SIZE, FLIGHT_CACHE_TTL)
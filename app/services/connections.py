@@ -0,0 +1,284 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+from database.cassandra import PROFILE_READ, execute_async, select_flight_statement, select_flights_statement
+from database.manager import connection_manager
+from services.graph_outbox import read_recent_changes
+from services.route_graph import load_routes
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Интервал полной перестройки расписания из Cassandra (секунды); между
+# перестройками расписание обновляется изменениями из роутера рейсов этого
+# процесса и, раз в CONNECTION_INDEX_FEED_INTERVAL, событиями outbox от
+# остальных воркеров. Изменение, пропущенное лентой событий, видно не позже
+# следующей перестройки
+CONNECTION_INDEX_REFRESH_INTERVAL = float(os.getenv("CONNECTION_INDEX_REFRESH_INTERVAL", "600"))
+CONNECTION_INDEX_FEED_INTERVAL = float(os.getenv("CONNECTION_INDEX_FEED_INTERVAL", "2"))
+CONNECTION_INDEX_FETCH_SIZE = int(os.getenv("CONNECTION_INDEX_FETCH_SIZE", "5000"))
+# Параметры поиска стыковок по умолчанию
+CONNECTION_MIN_CONNECTION_MINUTES = int(os.getenv("CONNECTION_MIN_CONNECTION_MINUTES", "45"))
+CONNECTION_MAX_TRANSFERS = int(os.getenv("CONNECTION_MAX_TRANSFERS", "3"))
+# Максимальное ожидание следующего рейса в аэропорту пересадки (часы)
+CONNECTION_MAX_WAIT_HOURS = float(os.getenv("CONNECTION_MAX_WAIT_HOURS", "24"))
+
+INFINITY = float("inf")
+
+
+def _timestamp(value: datetime) -> float:
+    # Cassandra возвращает время без часового пояса, оно хранится в UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class FlightSchedule:
+    """
+    Расписание рейсов в виде графа с развёрнутым временем (time-expanded).
+
+    Для каждого аэропорта хранится отсортированный по времени вылета список
+    рейсов (вылет, прилёт, аэропорт назначения, номер рейса). Узлы графа —
+    события вылета и прилёта, рёбра — рейсы и ожидание в аэропорту не меньше
+    минимального времени стыковки. Рейсы добавляются и удаляются по одному
+    (bisect), поэтому изменения из API применяются без перестройки.
+    """
+
+    def __init__(self, routes):
+        self.routes = {route.RouteID: (route.Origin, route.Destination) for route in routes}
+        self.departures = {}
+        self.flights = {}
+        self.skipped = 0
+
+    def _entry(self, flight_number, departure, arrival, route_id):
+        route = self.routes.get(route_id)
+        if route is None or departure is None or arrival is None:
+            # Рейс без известного маршрута или расписания не участвует в поиске
+            self.skipped += 1
+            return None, None
+        origin, destination = route
+        entry = (_timestamp(departure), _timestamp(arrival), destination, flight_number)
+        if entry[1] <= entry[0]:
+            self.skipped += 1
+            return None, None
+        return origin, entry
+
+    def load(self, rows):
+        """Массовое добавление рейсов при построении; после него нужен sort()."""
+        for flight_number, departure, arrival, route_id in rows:
+            origin, entry = self._entry(flight_number, departure, arrival, route_id)
+            if entry is not None:
+                self.departures.setdefault(origin, []).append(entry)
+                self.flights[flight_number] = (origin, entry)
+
+    def sort(self):
+        for departures in self.departures.values():
+            departures.sort()
+
+    def upsert(self, flight_number, departure, arrival, route_id):
+        self.remove(flight_number)
+        origin, entry = self._entry(flight_number, departure, arrival, route_id)
+        if entry is not None:
+            insort(self.departures.setdefault(origin, []), entry)
+            self.flights[flight_number] = (origin, entry)
+
+    def remove(self, flight_number):
+        found = self.flights.pop(flight_number, None)
+        if found is None:
+            return
+        origin, entry = found
+        departures = self.departures[origin]
+        del departures[bisect_left(departures, entry)]
+
+    def search(self, origin, destination, departure_after, min_connection, max_transfers, max_wait):
+        """
+        Поиск стыковок по раундам (как в RAPTOR): в раунде k найдены лучшие
+        прилёты с k пересадками. Возвращает Парето-оптимальные варианты
+        (число пересадок, время прилёта) в порядке возрастания пересадок:
+        каждый следующий вариант прилетает раньше предыдущего.
+        """
+        best = {}
+        options = []
+        # Аэропорт -> (время, с которого можно вылетать, цепочка рейсов)
+        reached = {origin: (departure_after, None)}
+        for transfers in range(max_transfers + 1):
+            improved = {}
+            for airport, (ready, journey) in reached.items():
+                departures = self.departures.get(airport, ())
+                latest = ready + max_wait
+                for i in range(bisect_left(departures, (ready,)), len(departures)):
+                    entry = departures[i]
+                    departure, arrival, next_airport, _ = entry
+                    if departure > latest:
+                        break
+                    # Прилёт должен улучшать и аэропорт, и уже найденный вариант до цели
+                    if arrival < best.get(next_airport, INFINITY) and arrival < best.get(destination, INFINITY):
+                        best[next_airport] = arrival
+                        improved[next_airport] = (arrival, (entry, journey))
+            if destination in improved:
+                options.append((transfers, _unwind(improved[destination][1])))
+            reached = {
+                airport: (arrival + min_connection, journey)
+                for airport, (arrival, journey) in improved.items()
+                if airport != destination
+            }
+            if not reached:
+                break
+        return options
+
+
+def _unwind(journey):
+    legs = []
+    while journey is not None:
+        entry, journey = journey
+        legs.append(entry)
+    return legs[::-1]
+
+
+async def load_schedule() -> FlightSchedule:
+    """Строит расписание из таблиц routes и flights (flights читается постранично)."""
+    schedule = FlightSchedule(await load_routes())
+    columns = ["flightnumber", "scheduleddeparturetime", "scheduledarrivaltime", "routeid"]
+    paging_state = None
+    while True:
+        statement = select_flights_statement(columns).bind(())
+        statement.fetch_size = CONNECTION_INDEX_FETCH_SIZE
+        result = await execute_async(
+            statement,
+            endpoint="connection_index",
+            execution_profile=PROFILE_READ,
+            paging_state=paging_state
+        )
+        schedule.load(
+            (row.flightnumber, row.scheduleddeparturetime, row.scheduledarrivaltime, row.routeid)
+            for row in result.current_rows
+        )
+        paging_state = result.paging_state
+        if not paging_state:
+            schedule.sort()
+            return schedule
+
+
+class ConnectionIndexService:
+    """
+    Хранит расписание для поиска стыковок: полностью перестраивает его из
+    Cassandra раз в CONNECTION_INDEX_REFRESH_INTERVAL и применяет изменения
+    рейсов — сделанные через API этого процесса сразу, а сделанные другими
+    воркерами по событиям outbox (services/graph_outbox.py) не реже раза в
+    CONNECTION_INDEX_FEED_INTERVAL.
+    """
+
+    def __init__(self):
+        self.schedule = None
+        self._tasks = []
+        self._pending = None
+        self.loaded_at = None
+        self.followed_at = None
+        self.last_error = None
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()), asyncio.create_task(self._follow())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    async def _run(self):
+        await connection_manager.wait_ready("cassandra")
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._pending = None
+                self.last_error = str(e)
+                logger.error(f"Ошибка загрузки расписания для поиска стыковок: {e}")
+            await asyncio.sleep(CONNECTION_INDEX_REFRESH_INTERVAL)
+
+    async def refresh(self):
+        # Изменения, пришедшие во время загрузки, применяются к новому расписанию
+        self._pending = []
+        schedule = await load_schedule()
+        for change in self._pending:
+            change(schedule)
+        self._pending = None
+        self.schedule = schedule
+        self.loaded_at = datetime.now(timezone.utc)
+        self.last_error = None
+        logger.info(f"Расписание для поиска стыковок загружено: {len(schedule.flights)} рейсов")
+
+    async def _follow(self):
+        await connection_manager.wait_ready("cassandra")
+        # Позиции чтения outbox; при первом чтении корзины повторно
+        # применяются её прежние события, что безвредно
+        cursors = {}
+        while True:
+            await asyncio.sleep(CONNECTION_INDEX_FEED_INTERVAL)
+            try:
+                flight_numbers = await read_recent_changes(cursors, "connection_index")
+                await self._reload_flights(flight_numbers)
+                self.followed_at = datetime.now(timezone.utc)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Ошибка чтения изменений рейсов для поиска стыковок: {e}")
+
+    async def _reload_flights(self, flight_numbers):
+        columns = ["scheduleddeparturetime", "scheduledarrivaltime", "routeid"]
+        flight_numbers = list(flight_numbers)
+        results = await asyncio.gather(*(
+            execute_async(
+                select_flight_statement(columns),
+                (flight_number,),
+                endpoint="connection_index",
+                execution_profile=PROFILE_READ
+            )
+            for flight_number in flight_numbers
+        ))
+        for flight_number, result in zip(flight_numbers, results):
+            row = result.one()
+            if row is None:
+                self.flight_deleted(flight_number)
+            else:
+                self._apply(lambda schedule, flight_number=flight_number, row=row: schedule.upsert(
+                    flight_number, row.scheduleddeparturetime, row.scheduledarrivaltime, row.routeid
+                ))
+
+    def _apply(self, change):
+        if self.schedule is not None:
+            change(self.schedule)
+        if self._pending is not None:
+            self._pending.append(change)
+
+    def flight_changed(self, flight_number, flight):
+        self._apply(lambda schedule: schedule.upsert(
+            flight_number, flight.ScheduledDepartureTime, flight.ScheduledArrivalTime, flight.RouteID
+        ))
+
+    def flight_deleted(self, flight_number):
+        self._apply(lambda schedule: schedule.remove(flight_number))
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.schedule is not None,
+            "flights": len(self.schedule.flights) if self.schedule else 0,
+            "skipped_flights": self.schedule.skipped if self.schedule else 0,
+            "loaded_at": self.loaded_at,
+            "followed_at": self.followed_at,
+            # Дольше этого изменение рейса другого воркера не остаётся невидимым
+            "max_staleness_seconds": CONNECTION_INDEX_REFRESH_INTERVAL,
+            "last_error": self.last_error,
+        }
+
+
+connection_index = ConnectionIndexService()
@@ -0,0 +1,138 @@
+"""
+Табло вылетов и прилётов (таблица flights_by_airport_day).
+
+Строки табло обновляет обработчик outbox (services/graph_outbox.py) по
+текущему состоянию рейса, поэтому повторная обработка события безопасна.
+Чтение и запись строк рейса не атомарны: их выполняет только владелец
+аренды шарда outbox, в который попадают события этого рейса.
+Для рейсов, созданных до появления табло, его можно заполнить из каталога app:
+
+    python -m services.flight_board backfill
+"""
+from datetime import date, datetime, timezone
+from database import cassandra
+from database.cassandra import (
+    FLIGHT_COLUMNS, PROFILE_READ, execute_async, flight_from_row, flight_values, get_statement, select_flights_statement
+)
+from models.flight import Flight
+import asyncio
+import os
+
+BOARD_BACKFILL_FETCH_SIZE = int(os.getenv("BOARD_BACKFILL_FETCH_SIZE", "1000"))
+BOARD_BACKFILL_CONCURRENCY = int(os.getenv("BOARD_BACKFILL_CONCURRENCY", "64"))
+
+DEPARTURE = "departure"
+ARRIVAL = "arrival"
+
+
+def _utc_day(value: datetime) -> date:
+    # Время без часового пояса хранится в Cassandra как UTC
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def board_placements(flight: Flight, origin: str, destination: str) -> dict:
+    """Строки табло для рейса: ключ (аэропорт, день, направление) -> время по расписанию."""
+    return {
+        (origin, _utc_day(flight.ScheduledDepartureTime), DEPARTURE): flight.ScheduledDepartureTime,
+        (destination, _utc_day(flight.ScheduledArrivalTime), ARRIVAL): flight.ScheduledArrivalTime,
+    }
+
+
+async def _load_route(route_id: str):
+    result = await execute_async(
+        get_statement("select_route"),
+        (route_id,),
+        endpoint="flight_board",
+        execution_profile=PROFILE_READ
+    )
+    return result.one()
+
+
+async def sync_flight_board(flight_number: str, flight: Flight = None):
+    """
+    Приводит строки табло рейса к его текущему состоянию; flight=None — рейс удалён.
+    Рейс с неизвестным маршрутом на табло не попадает.
+    """
+    placements = {}
+    if flight is not None:
+        route = await _load_route(flight.RouteID)
+        if route is not None:
+            placements = board_placements(flight, route.origin, route.destination)
+
+    result = await execute_async(get_statement("select_board_entries"), (flight_number,), endpoint="flight_board")
+    writes = []
+    for entry in result:
+        # Колонка date возвращается драйвером как cassandra.util.Date
+        key = (entry.airport, entry.day.date(), entry.direction)
+        if placements.get(key) == entry.scheduledtime:
+            continue
+        writes.append(execute_async(
+            get_statement("delete_board_flight"),
+            (*key, entry.scheduledtime, flight_number),
+            endpoint="flight_board"
+        ))
+        if key not in placements:
+            writes.append(execute_async(get_statement("delete_board_entry"), (flight_number, *key), endpoint="flight_board"))
+    for key, scheduled_time in placements.items():
+        # Строка перезаписывается всегда: мог измениться статус или фактическое время
+        writes.append(execute_async(
+            get_statement("insert_board_flight"),
+            (*key, scheduled_time, *flight_values(flight)),
+            endpoint="flight_board"
+        ))
+        writes.append(execute_async(
+            get_statement("insert_board_entry"),
+            (flight_number, *key, scheduled_time),
+            endpoint="flight_board"
+        ))
+    await asyncio.gather(*writes)
+
+
+async def get_board(airport: str, day: date, direction: str, endpoint: str, limit: int, paging_state: bytes = None):
+    """
+    Страница табло аэропорта за день: чтение одного раздела, рейсы упорядочены
+    по времени. Возвращает рейсы и paging_state следующей страницы (None, если
+    страница последняя).
+    """
+    statement = get_statement("select_board").bind((airport, day, direction))
+    statement.fetch_size = limit
+    result = await execute_async(
+        statement,
+        endpoint=endpoint,
+        execution_profile=PROFILE_READ,
+        paging_state=paging_state
+    )
+    # Только текущая страница: итерация по ResultSet запросила бы следующие
+    return [flight_from_row(row) for row in result.current_rows], result.paging_state
+
+
+async def backfill():
+    await asyncio.to_thread(cassandra.connect)
+    await cassandra.ensure_schema()
+    semaphore = asyncio.Semaphore(BOARD_BACKFILL_CONCURRENCY)
+
+    async def sync(flight):
+        async with semaphore:
+            await sync_flight_board(flight.FlightNumber, flight)
+
+    total = 0
+    paging_state = None
+    try:
+        while True:
+            statement = select_flights_statement(list(FLIGHT_COLUMNS)).bind(())
+            statement.fetch_size = BOARD_BACKFILL_FETCH_SIZE
+            result = await execute_async(statement, paging_state=paging_state)
+            await asyncio.gather(*(sync(flight_from_row(row)) for row in result.current_rows))
+            total += len(result.current_rows)
+            print(f"Обработано рейсов: {total}")
+            paging_state = result.paging_state
+            if not paging_state:
+                break
+    finally:
+        await asyncio.to_thread(cassandra.close_session)
+
+
+if __name__ == "__main__":
+    asyncio.run(backfill())
@@ -0,0 +1,463 @@
+from cassandra.util import datetime_from_uuid1
+from fastapi.encoders import jsonable_encoder
+from datetime import datetime, timezone
+from database.cassandra import PROFILE_READ, execute_async, flight_from_row, get_statement
+from database.manager import connection_manager
+from database.neo4j import get_neo4j_session
+from services.flight_board import sync_flight_board
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+
+logger = logging.getLogger(__name__)
+
+# Настройки outbox
+GRAPH_OUTBOX_SHARDS = int(os.getenv("GRAPH_OUTBOX_SHARDS", "16"))
+GRAPH_OUTBOX_BATCH_SIZE = int(os.getenv("GRAPH_OUTBOX_BATCH_SIZE", "1000"))
+GRAPH_OUTBOX_POLL_INTERVAL = float(os.getenv("GRAPH_OUTBOX_POLL_INTERVAL", "0.5"))
+GRAPH_OUTBOX_MAX_BACKOFF = float(os.getenv("GRAPH_OUTBOX_MAX_BACKOFF", "30"))
+# Срок аренды шарда (секунды). Аренда продлевается, когда осталось меньше
+# половины срока, поэтому обработка одной пачки должна укладываться в TTL / 2
+GRAPH_OUTBOX_LEASE_TTL = int(os.getenv("GRAPH_OUTBOX_LEASE_TTL", "30"))
+# Длина корзины outbox (секунды). Корзина закрывается через
+# GRAPH_OUTBOX_BUCKET_GRACE корзин после своего конца: запас на расхождение
+# часов воркеров API и задержку записи. Закрытая корзина дочитывается
+# целиком и удаляется одним запросом
+GRAPH_OUTBOX_BUCKET_SECONDS = int(os.getenv("GRAPH_OUTBOX_BUCKET_SECONDS", "60"))
+GRAPH_OUTBOX_BUCKET_GRACE = int(os.getenv("GRAPH_OUTBOX_BUCKET_GRACE", "2"))
+# С какой корзины начинать шард, для которого ещё нет отметки в graph_outbox_watermarks
+GRAPH_OUTBOX_LOOKBACK_BUCKETS = int(os.getenv("GRAPH_OUTBOX_LOOKBACK_BUCKETS", "60"))
+# Ограничение подсчёта очереди в status(): не больше стольких строк на шард
+GRAPH_OUTBOX_STATUS_LIMIT = int(os.getenv("GRAPH_OUTBOX_STATUS_LIMIT", "10000"))
+
+# Рейс, его свойства и связи. Старые связи удаляются, так как при обновлении
+# рейс мог сменить авиакомпанию, самолёт или маршрут.
+UPSERT_FLIGHTS_QUERY = """
+    UNWIND $flights AS row
+    MERGE (f:Flight {FlightNumber: row.FlightNumber})
+    SET f += row
+    WITH f, row
+    OPTIONAL MATCH (f)-[old:AFFILIATED_WITH|OPERATED_BY|HAS_ROUTE]->()
+    DELETE old
+    WITH DISTINCT f, row
+    MERGE (a:Airline {AirlineID: row.AirlineID})
+    MERGE (ac:Aircraft {AircraftID: row.AircraftID})
+    MERGE (r:Route {RouteID: row.RouteID})
+    MERGE (f)-[:AFFILIATED_WITH]->(a)
+    MERGE (f)-[:OPERATED_BY]->(ac)
+    MERGE (f)-[:HAS_ROUTE]->(r)
+"""
+
+DELETE_FLIGHTS_QUERY = """
+    UNWIND $flight_numbers AS flight_number
+    MATCH (f:Flight {FlightNumber: flight_number})
+    DETACH DELETE f
+"""
+
+
+def outbox_shard(flight_number: str) -> int:
+    # Все события одного рейса попадают в один шард, что сохраняет их порядок
+    return zlib.crc32(flight_number.encode()) % GRAPH_OUTBOX_SHARDS
+
+
+def outbox_bucket(timestamp: float = None) -> int:
+    if timestamp is None:
+        timestamp = time.time()
+    return int(timestamp // GRAPH_OUTBOX_BUCKET_SECONDS)
+
+
+async def record_flight_change(flight_number: str):
+    """
+    Записывает в outbox событие об изменении рейса для синхронизации в Neo4j.
+
+    Вызывается до записи рейса: если запись применится, событие для неё уже
+    есть, а лишнее событие безвредно, так как обработчик читает текущее
+    состояние рейса. После применённой записи вызывается confirm_flight_change.
+    """
+    await execute_async(
+        get_statement("insert_outbox_event"),
+        (outbox_shard(flight_number), outbox_bucket(), flight_number),
+        endpoint="graph_outbox"
+    )
+
+
+async def confirm_flight_change(flight_number: str):
+    """
+    Повторное событие после применённой записи рейса: обработчик мог забрать
+    первое событие раньше, чем запись стала видна. Ошибка только записывается
+    в журнал — запись рейса уже выполнена. Рейс останется несинхронизированным,
+    только если не удалась и эта запись, и обработчик успел прочитать старое
+    состояние; его исправит следующее изменение рейса.
+    """
+    try:
+        await record_flight_change(flight_number)
+    except Exception as e:
+        logger.error(f"Ошибка при записи события outbox для рейса {flight_number}: {e}")
+
+
+async def read_recent_changes(cursors: dict, endpoint: str) -> set:
+    """
+    Номера рейсов из событий открытых корзин outbox, записанных после позиций
+    cursors ({(шард, корзина): event_id}); позиции обновляются на месте.
+
+    Так любой воркер, в том числе не владеющий шардами, узнаёт об изменениях
+    рейсов, сделанных другими воркерами. Не видны события, которые получили
+    event_id меньше уже прочитанного (расхождение часов координаторов), и
+    события корзин, закрытых до чтения, — их должен покрывать периодический
+    полный пересчёт у вызывающего.
+    """
+    current = outbox_bucket()
+    first = current - GRAPH_OUTBOX_BUCKET_GRACE
+    keys = [
+        (shard, bucket)
+        for shard in range(GRAPH_OUTBOX_SHARDS)
+        for bucket in range(first, current + GRAPH_OUTBOX_BUCKET_GRACE + 1)
+    ]
+
+    async def read(key):
+        shard, bucket = key
+        flight_numbers = set()
+        while True:
+            cursor = cursors.get(key)
+            if cursor is None:
+                statement, values = get_statement("select_outbox_events"), (shard, bucket, GRAPH_OUTBOX_BATCH_SIZE)
+            else:
+                statement = get_statement("select_outbox_events_after")
+                values = (shard, bucket, cursor, GRAPH_OUTBOX_BATCH_SIZE)
+            result = await execute_async(statement, values, endpoint=endpoint, execution_profile=PROFILE_READ)
+            rows = list(result)
+            if rows:
+                cursors[key] = rows[-1].event_id
+            flight_numbers.update(row.flightnumber for row in rows)
+            if len(rows) < GRAPH_OUTBOX_BATCH_SIZE:
+                return flight_numbers
+
+    results = await asyncio.gather(*(read(key) for key in keys))
+    # Позиции корзин, вышедших из окна, больше не нужны
+    for key in [key for key in cursors if key[1] < first]:
+        del cursors[key]
+    return set().union(*results)
+
+
+async def _apply_graph_changes(tx, upserts, deletes):
+    if upserts:
+        await tx.run(UPSERT_FLIGHTS_QUERY, flights=upserts)
+    if deletes:
+        await tx.run(DELETE_FLIGHTS_QUERY, flight_numbers=deletes)
+
+
+class LeaseLost(Exception):
+    """Аренда шарда истекла: пачку обработает новый владелец."""
+
+
+class GraphOutboxWorker:
+    """
+    Фоновый обработчик outbox: переносит изменения рейсов из Cassandra в Neo4j
+    и в табло вылетов и прилётов (services/flight_board.py).
+
+    Шарды обрабатываются пачками по GRAPH_OUTBOX_BATCH_SIZE событий, каждая
+    пачка применяется в Neo4j одной транзакцией из UNWIND-запросов; при ошибке
+    обработка повторяется с экспоненциальной задержкой.
+
+    Корзины шарда читаются по порядку, начиная с отметки в
+    graph_outbox_watermarks. Открытую корзину обработчик читает после
+    последнего прочитанного event_id и запоминает обработанные события, но не
+    удаляет их. После закрытия корзина перечитывается целиком — timeuuid
+    выдаёт координатор, и из-за расхождения часов событие, записанное позже,
+    может получить меньший event_id, — затем удаляется одним запросом, и
+    отметка шарда сдвигается.
+
+    Обработчик запускается в каждом воркере API, но шард обрабатывает только
+    владелец его аренды (LWT-строка в graph_outbox_leases). Так у каждого
+    шарда один потребитель, и события рейса применяются по порядку.
+    """
+
+    def __init__(self):
+        self._task = None
+        self.owner = None
+        # Шард -> момент истечения аренды по time.monotonic()
+        self._leases = {}
+        # Шард -> момент следующей попытки взять чужую аренду
+        self._next_acquire = {}
+        # Шард -> первая неудалённая корзина
+        self._watermarks = {}
+        # Шард -> {корзина: состояние чтения}, см. _bucket_state
+        self._buckets = {}
+        self.processed_events = 0
+        self.failed_attempts = 0
+        self.last_error = None
+        self.last_drained_at = None
+
+    def start(self):
+        if self._task is None:
+            self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._release_leases()
+
+    async def _release_leases(self):
+        # Освобождённые шарды другие воркеры заберут, не дожидаясь TTL
+        shards, self._leases = list(self._leases), {}
+        self._watermarks, self._buckets = {}, {}
+        results = await asyncio.gather(*(
+            execute_async(get_statement("release_outbox_lease"), (shard, self.owner), endpoint="graph_outbox")
+            for shard in shards
+        ), return_exceptions=True)
+        for shard, result in zip(shards, results):
+            if isinstance(result, Exception):
+                logger.error(f"Не удалось освободить аренду шарда outbox {shard}: {result}")
+
+    def _holds_lease(self, shard: int) -> bool:
+        expires = self._leases.get(shard)
+        return expires is not None and expires > time.monotonic()
+
+    def _ensure_lease(self, shard: int):
+        if not self._holds_lease(shard):
+            raise LeaseLost(f"Аренда шарда outbox {shard} истекла во время обработки")
+
+    async def _hold_lease(self, shard: int) -> bool:
+        """Продлевает или берёт аренду шарда; True, если шард можно обрабатывать."""
+        # Срок отсчитывается от момента отправки запроса, то есть с запасом
+        started = time.monotonic()
+        expires = self._leases.get(shard)
+        if expires is not None:
+            if expires - started > GRAPH_OUTBOX_LEASE_TTL / 2:
+                return True
+            result = await execute_async(
+                get_statement("renew_outbox_lease"),
+                (GRAPH_OUTBOX_LEASE_TTL, self.owner, shard, self.owner),
+                endpoint="graph_outbox"
+            )
+            if result.was_applied:
+                self._leases[shard] = started + GRAPH_OUTBOX_LEASE_TTL
+                return True
+            del self._leases[shard]
+            self._forget_shard(shard)
+            logger.warning(f"Аренда шарда outbox {shard} потеряна")
+        elif started < self._next_acquire.get(shard, 0):
+            return False
+        result = await execute_async(
+            get_statement("acquire_outbox_lease"),
+            (shard, self.owner, GRAPH_OUTBOX_LEASE_TTL),
+            endpoint="graph_outbox"
+        )
+        if result.was_applied:
+            # Пока шард был у другого владельца, он мог сдвинуть отметку
+            self._forget_shard(shard)
+            self._leases[shard] = started + GRAPH_OUTBOX_LEASE_TTL
+            return True
+        self._next_acquire[shard] = started + GRAPH_OUTBOX_LEASE_TTL / 3
+        return False
+
+    def _forget_shard(self, shard: int):
+        self._watermarks.pop(shard, None)
+        self._buckets.pop(shard, None)
+
+    def _bucket_state(self, shard: int, bucket: int) -> dict:
+        # cursor — последний прочитанный event_id, seen — обработанные события,
+        # final — корзина закрыта и перечитывается с начала
+        return self._buckets.setdefault(shard, {}).setdefault(
+            bucket, {"cursor": None, "seen": set(), "final": False}
+        )
+
+    async def _watermark(self, shard: int, current: int) -> int:
+        if shard not in self._watermarks:
+            result = await execute_async(
+                get_statement("select_outbox_watermark"),
+                (shard,),
+                endpoint="graph_outbox",
+                execution_profile=PROFILE_READ
+            )
+            row = result.one()
+            self._watermarks[shard] = row.bucket if row else current - GRAPH_OUTBOX_LOOKBACK_BUCKETS
+        return self._watermarks[shard]
+
+    async def _run(self):
+        await connection_manager.wait_ready("cassandra", "neo4j")
+        backoff = GRAPH_OUTBOX_POLL_INTERVAL
+        while True:
+            try:
+                processed = await self.drain_once()
+                backoff = GRAPH_OUTBOX_POLL_INTERVAL
+                if processed:
+                    # Пока в outbox есть события, обрабатываем их без паузы
+                    continue
+                await asyncio.sleep(GRAPH_OUTBOX_POLL_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed_attempts += 1
+                self.last_error = str(e)
+                logger.error(f"Ошибка синхронизации outbox в Neo4j, повтор через {backoff} с: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, GRAPH_OUTBOX_MAX_BACKOFF)
+
+    async def drain_once(self) -> int:
+        processed = 0
+        for shard in range(GRAPH_OUTBOX_SHARDS):
+            if not await self._hold_lease(shard):
+                continue
+            try:
+                processed += await self._drain_shard(shard)
+            except LeaseLost as e:
+                logger.warning(str(e))
+        self.last_drained_at = datetime.now(timezone.utc)
+        return processed
+
+    async def _drain_shard(self, shard: int) -> int:
+        current = outbox_bucket()
+        bucket = await self._watermark(shard, current)
+        # Корзины после текущей читаются, если часы записавшего воркера спешат
+        while bucket <= current + GRAPH_OUTBOX_BUCKET_GRACE:
+            closed = bucket < current - GRAPH_OUTBOX_BUCKET_GRACE
+            state = self._bucket_state(shard, bucket)
+            if closed and not state["final"]:
+                state["final"], state["cursor"] = True, None
+            events = await self._read_bucket(shard, bucket, state)
+            if events:
+                await self._apply_events(shard, events)
+                state["cursor"] = events[-1].event_id
+                state["seen"].update(event.event_id for event in events)
+                self.processed_events += len(events)
+                return len(events)
+            if not closed:
+                bucket += 1
+                continue
+            # Закрытая корзина обработана: удаляется весь раздел
+            self._ensure_lease(shard)
+            if state["seen"]:
+                await execute_async(get_statement("delete_outbox_bucket"), (shard, bucket), endpoint="graph_outbox")
+            await execute_async(get_statement("update_outbox_watermark"), (bucket + 1, shard), endpoint="graph_outbox")
+            del self._buckets[shard][bucket]
+            bucket += 1
+            self._watermarks[shard] = bucket
+        return 0
+
+    async def _read_bucket(self, shard: int, bucket: int, state: dict) -> list:
+        """Следующие необработанные события корзины после state["cursor"]."""
+        while True:
+            if state["cursor"] is None:
+                statement, values = get_statement("select_outbox_events"), (shard, bucket, GRAPH_OUTBOX_BATCH_SIZE)
+            else:
+                statement = get_statement("select_outbox_events_after")
+                values = (shard, bucket, state["cursor"], GRAPH_OUTBOX_BATCH_SIZE)
+            result = await execute_async(statement, values, endpoint="graph_outbox", execution_profile=PROFILE_READ)
+            rows = list(result)
+            events = [row for row in rows if row.event_id not in state["seen"]]
+            if events or len(rows) < GRAPH_OUTBOX_BATCH_SIZE:
+                return events
+            # Вся страница уже обработана (повторное чтение закрытой корзины)
+            state["cursor"] = rows[-1].event_id
+
+    async def _apply_events(self, shard: int, events: list):
+        # Для каждого рейса достаточно применить его текущее состояние
+        flight_numbers = list(dict.fromkeys(event.flightnumber for event in events))
+        rows = await asyncio.gather(*(
+            execute_async(
+                get_statement("select_flight"),
+                (flight_number,),
+                endpoint="graph_outbox",
+                execution_profile=PROFILE_READ
+            )
+            for flight_number in flight_numbers
+        ))
+        flights = {}
+        upserts = []
+        deletes = []
+        for flight_number, row in zip(flight_numbers, rows):
+            flight = row.one()
+            flights[flight_number] = flight_from_row(flight) if flight else None
+            if flight:
+                upserts.append(jsonable_encoder(flights[flight_number]))
+            else:
+                deletes.append(flight_number)
+
+        # Табло и граф изменяются только владельцем аренды шарда: чтение
+        # и запись строк табло рейса не атомарны, и два обработчика одного
+        # рейса могли бы оставить его сразу в двух днях. Аренда проверяется
+        # перед каждым шагом, так как пачка могла обрабатываться дольше её срока
+        self._ensure_lease(shard)
+        await asyncio.gather(*(
+            sync_flight_board(flight_number, flight) for flight_number, flight in flights.items()
+        ))
+
+        self._ensure_lease(shard)
+        async with get_neo4j_session() as neo_session:
+            await neo_session.execute_write(_apply_graph_changes, upserts, deletes)
+        self._ensure_lease(shard)
+
+    async def status(self) -> dict:
+        """
+        Состояние outbox. Очередь считается по неудалённым корзинам, не больше
+        GRAPH_OUTBOX_STATUS_LIMIT строк на шард; если подсчёт обрезан,
+        depth_estimated = true. Обработанные события открытых корзин
+        вычитаются только для шардов этого воркера; для остальных шардов
+        depth включает их до удаления корзины.
+        """
+        current = outbox_bucket()
+        result = await execute_async(
+            get_statement("select_outbox_watermarks"),
+            endpoint="graph_outbox",
+            execution_profile=PROFILE_READ
+        )
+        watermarks = {row.shard: row.bucket for row in result}
+        shards = list(range(GRAPH_OUTBOX_SHARDS))
+        # Корзины старше GRAPH_OUTBOX_LOOKBACK_BUCKETS не читаются: отстающий
+        # шард учитывается частично, и depth тоже становится оценкой
+        earliest = current - GRAPH_OUTBOX_LOOKBACK_BUCKETS
+        buckets = {}
+        estimated = False
+        for shard in shards:
+            first = self._watermarks.get(shard, watermarks.get(shard, earliest))
+            estimated = estimated or first < earliest
+            buckets[shard] = list(range(max(first, earliest), current + GRAPH_OUTBOX_BUCKET_GRACE + 1))
+        results = await asyncio.gather(*(
+            execute_async(
+                get_statement("select_outbox_backlog"),
+                (shard, buckets[shard], GRAPH_OUTBOX_STATUS_LIMIT),
+                endpoint="graph_outbox",
+                execution_profile=PROFILE_READ
+            )
+            for shard in shards
+        ))
+        depth = 0
+        oldest = None
+        for shard, result in zip(shards, results):
+            rows = list(result)
+            estimated = estimated or len(rows) >= GRAPH_OUTBOX_STATUS_LIMIT
+            seen = set()
+            if self._holds_lease(shard):
+                for state in self._buckets.get(shard, {}).values():
+                    seen |= state["seen"]
+            for row in rows:
+                if row.event_id in seen:
+                    continue
+                depth += 1
+                created_at = datetime_from_uuid1(row.event_id).replace(tzinfo=timezone.utc)
+                oldest = created_at if oldest is None else min(oldest, created_at)
+        lag = (datetime.now(timezone.utc) - oldest).total_seconds() if oldest else 0.0
+        return {
+            "depth": depth,
+            "depth_estimated": estimated,
+            "lag_seconds": lag,
+            "processed_events": self.processed_events,
+            "failed_attempts": self.failed_attempts,
+            "last_error": self.last_error,
+            "last_drained_at": self.last_drained_at,
+            "owner": self.owner,
+            "owned_shards": sorted(shard for shard in self._leases if self._holds_lease(shard)),
+        }
+
+graph_outbox_worker = GraphOutboxWorker()
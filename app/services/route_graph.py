@@ -0,0 +1,198 @@
+from array import array
+from datetime import datetime, timezone
+from database.cassandra import PROFILE_READ, execute_async, get_statement
+from database.manager import connection_manager
+from models.route import Route
+import asyncio
+import heapq
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Интервал перезагрузки графа маршрутов из Cassandra (секунды)
+ROUTE_GRAPH_REFRESH_INTERVAL = float(os.getenv("ROUTE_GRAPH_REFRESH_INTERVAL", "300"))
+ROUTE_GRAPH_FETCH_SIZE = int(os.getenv("ROUTE_GRAPH_FETCH_SIZE", "5000"))
+
+INFINITY = float("inf")
+
+
+class RouteGraph:
+    """
+    Неизменяемый граф маршрутов в формате CSR (compressed sparse row).
+
+    Аэропорты пронумерованы, исходящие маршруты аэропорта i занимают позиции
+    offsets[i]..offsets[i+1] в массивах sources, targets, distances, times и routes.
+    Граф не изменяется после построения, поэтому поиск идёт без блокировок,
+    а обновление — это замена всего графа.
+    """
+
+    def __init__(self, routes):
+        routes = sorted(routes, key=lambda route: route.Origin)
+        self.airports = sorted({route.Origin for route in routes} | {route.Destination for route in routes})
+        self.index = {code: i for i, code in enumerate(self.airports)}
+        self.offsets = array("l", [0] * (len(self.airports) + 1))
+        self.sources = array("l")
+        self.targets = array("l")
+        self.distances = array("d")
+        self.times = array("d")
+        self.routes = []
+        for route in routes:
+            self.offsets[self.index[route.Origin] + 1] += 1
+            self.sources.append(self.index[route.Origin])
+            self.targets.append(self.index[route.Destination])
+            self.distances.append(route.Distance)
+            self.times.append(route.TravelTime)
+            self.routes.append(route)
+        for i in range(len(self.airports)):
+            self.offsets[i + 1] += self.offsets[i]
+
+    def __contains__(self, code):
+        return code in self.index
+
+    def _dijkstra(self, source, target, weights, banned_nodes=(), banned_edges=()):
+        # Дейкстра с остановкой при достижении цели; возвращает (стоимость, рёбра пути)
+        offsets, targets = self.offsets, self.targets
+        best = [INFINITY] * len(self.airports)
+        previous = [-1] * len(self.airports)
+        best[source] = 0.0
+        queue = [(0.0, source)]
+        while queue:
+            cost, node = heapq.heappop(queue)
+            if node == target:
+                edges = []
+                while node != source:
+                    edge = previous[node]
+                    edges.append(edge)
+                    node = self.sources[edge]
+                return cost, edges[::-1]
+            if cost > best[node]:
+                continue
+            for edge in range(offsets[node], offsets[node + 1]):
+                neighbour = targets[edge]
+                candidate = cost + weights[edge]
+                if candidate < best[neighbour] and neighbour not in banned_nodes and edge not in banned_edges:
+                    best[neighbour] = candidate
+                    previous[neighbour] = edge
+                    heapq.heappush(queue, (candidate, neighbour))
+        return None
+
+    def _edge_origin(self, edge):
+        return self.sources[edge]
+
+    def shortest_paths(self, origin: str, destination: str, weight: str = "distance", k: int = 1):
+        """
+        До k кратчайших путей без циклов (алгоритм Йена) по весу distance или time.
+        Возвращает списки маршрутов в порядке возрастания стоимости.
+        """
+        weights = self.distances if weight == "distance" else self.times
+        source, target = self.index[origin], self.index[destination]
+        first = self._dijkstra(source, target, weights)
+        if first is None:
+            return []
+        paths = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        while len(paths) < k:
+            cost, edges = paths[-1]
+            for i in range(len(edges)):
+                # Ответвление от i-го аэропорта пути: запрещаются уже найденные
+                # продолжения общего префикса и аэропорты самого префикса
+                prefix = edges[:i]
+                spur = self._edge_origin(edges[i])
+                banned_edges = {path[i] for _, path in paths if len(path) > i and path[:i] == prefix}
+                banned_nodes = {self._edge_origin(edge) for edge in prefix}
+                found = self._dijkstra(spur, target, weights, banned_nodes, banned_edges)
+                if found is None:
+                    continue
+                path = prefix + found[1]
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (sum(weights[edge] for edge in path), path))
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates))
+        return [[self.routes[edge] for edge in edges] for _, edges in paths]
+
+
+async def load_routes():
+    """Читает все маршруты из Cassandra постранично."""
+    routes = []
+    paging_state = None
+    while True:
+        statement = get_statement("select_routes").bind(())
+        statement.fetch_size = ROUTE_GRAPH_FETCH_SIZE
+        result = await execute_async(
+            statement,
+            endpoint="route_graph",
+            execution_profile=PROFILE_READ,
+            paging_state=paging_state
+        )
+        routes.extend(
+            Route(
+                RouteID=row.routeid,
+                Origin=row.origin,
+                Destination=row.destination,
+                Distance=row.distance,
+                TravelTime=row.traveltime
+            )
+            for row in result.current_rows
+        )
+        paging_state = result.paging_state
+        if not paging_state:
+            return routes
+
+
+class RouteGraphService:
+    """Хранит текущий граф маршрутов и периодически перестраивает его из Cassandra."""
+
+    def __init__(self):
+        self.graph = None
+        self._task = None
+        self.loaded_at = None
+        self.last_error = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        await connection_manager.wait_ready("cassandra")
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Продолжаем отвечать по предыдущему графу
+                self.last_error = str(e)
+                logger.error(f"Ошибка загрузки графа маршрутов: {e}")
+            await asyncio.sleep(ROUTE_GRAPH_REFRESH_INTERVAL)
+
+    async def refresh(self):
+        routes = await load_routes()
+        self.graph = RouteGraph(routes)
+        self.loaded_at = datetime.now(timezone.utc)
+        self.last_error = None
+        logger.info(f"Граф маршрутов загружен: {len(self.graph.airports)} аэропортов, {len(routes)} маршрутов")
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self.graph is not None,
+            "airports": len(self.graph.airports) if self.graph else 0,
+            "routes": len(self.graph.routes) if self.graph else 0,
+            "loaded_at": self.loaded_at,
+            "last_error": self.last_error,
+        }
+
+
+route_graph_service = RouteGraphService()
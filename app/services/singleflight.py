@@ -0,0 +1,61 @@
+import asyncio
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых запросов (single-flight).
+
+    Пока для ключа выполняется обращение к базе, остальные вызовы с тем же
+    ключом не делают своих запросов, а ждут результат уже начатого. Результат
+    не хранится после завершения, поэтому устаревших данных не появляется.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # Запрос выполняется отдельной задачей: отмена первого вызывающего
+            # (например, при разрыве соединения) не отменяет его для остальных
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda done, key=key: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def forget(self, key):
+        """Следующие вызовы для ключа начнут новый запрос (используется после записи)."""
+        self._calls.pop(key, None)
+
+    def forget_matching(self, predicate):
+        """Как forget, но для всех ключей, удовлетворяющих условию."""
+        for key in [key for key in self._calls if predicate(key)]:
+            del self._calls[key]
+
+    def _finish(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Помечаем исключение полученным, даже если все ожидающие были отменены
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
+
+
+flight_lookups = SingleFlight("flights")
+passenger_lookups = SingleFlight("passengers")
+
+
+def singleflight_stats() -> dict:
+    return {group.name: group.stats() for group in (flight_lookups, passenger_lookups)}
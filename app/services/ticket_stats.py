@@ -0,0 +1,241 @@
+"""
+Счётчики билетов по рейсам и общие итоги (таблицы flight_ticket_counts и
+ticket_totals в Cassandra).
+
+Билет учитывается на рейсе FlightNumber, пока его статус не Cancelled и
+рейс существует: при удалении рейса его билеты вычитаются из итогов, а
+билеты, выданные до создания рейса, учитываются после сверки.
+Роутеры пассажиров и рейсов передают сюда изменения, поэтому число билетов
+рейса и среднее число билетов на рейс читаются одной строкой, без просмотра
+таблиц. Обновления счётчиков не идемпотентны и не входят в одну транзакцию
+с записью в MongoDB, поэтому после сбоев счётчики сверяются с исходными
+данными (из каталога app):
+
+    python -m services.ticket_stats reconcile
+"""
+from collections import Counter
+from database import cassandra, mongodb
+from database.cassandra import (
+    PROFILE_READ, execute_async, get_statement, select_flight_statement, select_flights_statement
+)
+from database.mongodb import get_passengers_collection
+import asyncio
+import json
+import logging
+import os
+import sys
+
+logger = logging.getLogger(__name__)
+
+TICKET_STATS_FETCH_SIZE = int(os.getenv("TICKET_STATS_FETCH_SIZE", "5000"))
+TICKET_STATS_CONCURRENCY = int(os.getenv("TICKET_STATS_CONCURRENCY", "64"))
+
+# Ключ единственной строки ticket_totals
+TICKET_TOTALS_KEY = "all"
+CANCELLED_STATUS = "Cancelled"
+
+
+def _ticket_field(ticket, name):
+    # Билеты приходят моделями Ticket (из запроса) или документами MongoDB
+    return ticket.get(name) if isinstance(ticket, dict) else getattr(ticket, name, None)
+
+
+def active_ticket_counts(tickets) -> Counter:
+    """Число действующих билетов по номерам рейсов."""
+    counts = Counter()
+    for ticket in tickets or ():
+        flight_number = _ticket_field(ticket, "FlightNumber")
+        if flight_number and _ticket_field(ticket, "TicketStatus") != CANCELLED_STATUS:
+            counts[flight_number] += 1
+    return counts
+
+
+def ticket_deltas(before, after) -> dict:
+    """Изменение числа действующих билетов по рейсам между двумя списками билетов."""
+    deltas = active_ticket_counts(after)
+    deltas.subtract(active_ticket_counts(before))
+    return {flight_number: delta for flight_number, delta in deltas.items() if delta}
+
+
+async def _increment_flight(flight_number: str, delta: int, semaphore):
+    async with semaphore:
+        await execute_async(get_statement("increment_flight_tickets"), (delta, flight_number), endpoint="ticket_stats")
+
+
+async def _increment_totals(tickets: int, flights: int):
+    if tickets or flights:
+        await execute_async(
+            get_statement("increment_ticket_totals"),
+            (tickets, flights, TICKET_TOTALS_KEY),
+            endpoint="ticket_stats"
+        )
+
+
+async def _increment(deltas: dict, flights: int = 0):
+    semaphore = asyncio.Semaphore(TICKET_STATS_CONCURRENCY)
+    await asyncio.gather(
+        *(_increment_flight(flight_number, delta, semaphore) for flight_number, delta in deltas.items()),
+        _increment_totals(sum(deltas.values()), flights)
+    )
+
+
+async def tickets_changed(before, after):
+    """
+    Применяет к счётчикам изменение билетов пассажира. Ошибка только
+    записывается в журнал: запись в MongoDB уже выполнена, а расхождение
+    исправит сверка.
+    """
+    deltas = ticket_deltas(before, after)
+    if not deltas:
+        return
+    try:
+        # Билеты несуществующих (в том числе удалённых) рейсов не учитываются
+        exists = await asyncio.gather(*(_flight_exists(flight_number) for flight_number in deltas))
+        deltas = {flight_number: delta for (flight_number, delta), found in zip(deltas.items(), exists) if found}
+        if deltas:
+            await _increment(deltas)
+    except Exception as e:
+        logger.error(f"Ошибка обновления счётчиков билетов {deltas}: {e}")
+
+
+async def _flight_exists(flight_number: str) -> bool:
+    result = await execute_async(
+        select_flight_statement(["flightnumber"]),
+        (flight_number,),
+        endpoint="ticket_stats",
+        execution_profile=PROFILE_READ
+    )
+    return result.one() is not None
+
+
+async def flights_changed(delta: int):
+    """Изменяет общее число рейсов (создание и удаление рейсов)."""
+    if not delta:
+        return
+    try:
+        await _increment({}, flights=delta)
+    except Exception as e:
+        logger.error(f"Ошибка обновления счётчика рейсов на {delta}: {e}")
+
+
+async def flight_deleted(flight_number: str):
+    """
+    Рейс удалён: его билеты больше не учитываются ни в счётчике рейса, ни в
+    итогах, а последующие изменения этих билетов пропускаются (см.
+    tickets_changed). Изменения, пришедшие одновременно с удалением, исправит сверка.
+    """
+    try:
+        tickets = await get_flight_ticket_count(flight_number, "ticket_stats")
+        await _increment({flight_number: -tickets} if tickets else {}, flights=-1)
+    except Exception as e:
+        logger.error(f"Ошибка обновления счётчиков билетов удалённого рейса {flight_number}: {e}")
+
+
+async def get_flight_ticket_count(flight_number: str, endpoint: str) -> int:
+    result = await execute_async(
+        get_statement("select_flight_tickets"),
+        (flight_number,),
+        endpoint=endpoint,
+        execution_profile=PROFILE_READ
+    )
+    row = result.one()
+    return (row.tickets or 0) if row else 0
+
+
+async def get_ticket_totals(endpoint: str) -> tuple:
+    """Общее число действующих билетов и рейсов."""
+    result = await execute_async(
+        get_statement("select_ticket_totals"),
+        (TICKET_TOTALS_KEY,),
+        endpoint=endpoint,
+        execution_profile=PROFILE_READ
+    )
+    row = result.one()
+    return (row.tickets or 0, row.flights or 0) if row else (0, 0)
+
+
+async def _count_passenger_tickets() -> Counter:
+    passengers_collection = get_passengers_collection("ticket_stats")
+    cursor = await passengers_collection.aggregate([
+        {"$unwind": "$Tickets"},
+        {"$match": {
+            "Tickets.FlightNumber": {"$nin": [None, ""]},
+            "Tickets.TicketStatus": {"$ne": CANCELLED_STATUS},
+        }},
+        {"$group": {"_id": "$Tickets.FlightNumber", "tickets": {"$sum": 1}}},
+    ], allowDiskUse=True)
+    return Counter({document["_id"]: document["tickets"] async for document in cursor})
+
+
+async def _iter_rows(prepared):
+    # Постраничное чтение всей таблицы (только для сверки)
+    paging_state = None
+    while True:
+        statement = prepared.bind(())
+        statement.fetch_size = TICKET_STATS_FETCH_SIZE
+        result = await execute_async(
+            statement,
+            endpoint="ticket_stats",
+            execution_profile=PROFILE_READ,
+            paging_state=paging_state
+        )
+        for row in result.current_rows:
+            yield row
+        paging_state = result.paging_state
+        if not paging_state:
+            return
+
+
+async def reconcile() -> dict:
+    """
+    Пересчитывает счётчики по билетам в MongoDB и таблице flights; билеты
+    рейсов, которых нет в flights, не учитываются.
+
+    Значение счётчика нельзя присвоить, поэтому к нему прибавляется разница
+    между пересчитанным и текущим значением. Изменения билетов, сделанные во
+    время сверки, могут оставить расхождение до следующего запуска.
+    """
+    flight_numbers = set()
+    async for row in _iter_rows(select_flights_statement(["flightnumber"])):
+        flight_numbers.add(row.flightnumber)
+    flights = len(flight_numbers)
+    expected = Counter({
+        flight_number: tickets
+        for flight_number, tickets in (await _count_passenger_tickets()).items()
+        if flight_number in flight_numbers
+    })
+    current = Counter()
+    async for row in _iter_rows(get_statement("select_flight_ticket_counts")):
+        current[row.flightnumber] = row.tickets or 0
+    deltas = {
+        flight_number: expected[flight_number] - current[flight_number]
+        for flight_number in expected.keys() | current.keys()
+        if expected[flight_number] != current[flight_number]
+    }
+
+    semaphore = asyncio.Semaphore(TICKET_STATS_CONCURRENCY)
+    await asyncio.gather(*(
+        _increment_flight(flight_number, delta, semaphore) for flight_number, delta in deltas.items()
+    ))
+    # Итоги приводятся к пересчитанным значениям отдельно от счётчиков рейсов
+    tickets, counted_flights = await get_ticket_totals("ticket_stats")
+    total_tickets = sum(expected.values())
+    await _increment_totals(total_tickets - tickets, flights - counted_flights)
+    return {"tickets": total_tickets, "flights": flights, "corrected_flights": len(deltas)}
+
+
+async def _main():
+    await asyncio.gather(mongodb.connect(), asyncio.to_thread(cassandra.connect))
+    try:
+        await cassandra.ensure_schema()
+        report = await reconcile()
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    finally:
+        await mongodb.close_client()
+        await asyncio.to_thread(cassandra.close_session)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconcile"]:
+        sys.exit("Использование: python -m services.ticket_stats reconcile")
+    asyncio.run(_main())
@@ -0,0 +1,54 @@
+import json
+from fastapi import HTTPException, Request
+
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+async def iter_request_items(request: Request):
+    """
+    Перебирает элементы тела запроса массовой загрузки.
+
+    Поддерживается JSON-массив и NDJSON (по объекту на строку). NDJSON
+    читается из потока по частям, не загружая всё тело в память.
+    Возвращает пары (индекс, объект); для некорректной строки NDJSON вместо
+    объекта возвращается исключение json.JSONDecodeError.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        index = 0
+        buffer = b""
+        async for chunk in request.stream():
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, _parse_line(line)
+                    index += 1
+        if buffer.strip():
+            yield index, _parse_line(buffer)
+        return
+
+    try:
+        items = await request.json()
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Тело запроса должно быть JSON-массивом или NDJSON")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=400, detail="Тело запроса должно быть JSON-массивом или NDJSON")
+    for index, item in enumerate(items):
+        yield index, item
+
+def _parse_line(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        return e
+
+async def iter_chunks(items, size):
+    """Группирует элементы асинхронного итератора в списки длиной не более size."""
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,59 @@
+import base64
+import binascii
+import json
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from utils.bulk import NDJSON_CONTENT_TYPES
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def encode_page_token(position: dict) -> str:
+    """Кодирует позицию последнего элемента страницы в непрозрачный токен."""
+    data = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+def decode_page_token(token: str, keys: dict) -> dict:
+    """
+    Позиция из токена страницы; keys — типы значений по ключам сортировки.
+    Значения подставляются в фильтр запроса, поэтому токен с другими ключами
+    или типами (в том числе с операторами MongoDB) отклоняется.
+    """
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        position = json.loads(data)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный токен страницы")
+    if not isinstance(position, dict) or set(position) != set(keys):
+        raise HTTPException(status_code=400, detail="Некорректный токен страницы")
+    for key, value_type in keys.items():
+        value = position[key]
+        # bool в Python — подкласс int
+        if not isinstance(value, value_type) or isinstance(value, bool):
+            raise HTTPException(status_code=400, detail="Некорректный токен страницы")
+    return position
+
+def encode_paging_state(paging_state: bytes) -> str:
+    """Кодирует paging_state драйвера Cassandra в токен для клиента."""
+    return base64.urlsafe_b64encode(paging_state).decode().rstrip("=")
+
+def decode_paging_state(token: str) -> bytes:
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Некорректный токен страницы")
+
+def ndjson_requested(request: Request, output_format: str = None) -> bool:
+    """Клиент запросил потоковую выдачу NDJSON (параметром format или заголовком Accept)."""
+    if output_format is not None:
+        return output_format == "ndjson"
+    accept = request.headers.get("accept", "")
+    return any(media_type in accept for media_type in NDJSON_CONTENT_TYPES)
+
+async def iter_ndjson(items):
+    """Сериализует модели (или словари) из асинхронного итератора по одной на строку."""
+    async for item in items:
+        if isinstance(item, BaseModel):
+            yield item.model_dump_json() + "\n"
+        else:
+            yield json.dumps(jsonable_encoder(item), ensure_ascii=False) + "\n"
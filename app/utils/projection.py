@@ -0,0 +1,23 @@
+from fastapi import HTTPException
+
+def parse_fields(fields: str, allowed, required=()) -> list:
+    """
+    Разбирает параметр fields (имена полей через запятую).
+
+    Возвращает поля в порядке allowed; обязательные поля добавляются всегда.
+    Если fields не задан, возвращаются все поля.
+    """
+    if not fields:
+        return list(allowed)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    requested.update(required)
+    return [field for field in allowed if field in requested]
+
+def mongo_projection(fields) -> dict:
+    """Проекция MongoDB, возвращающая только указанные поля (без _id)."""
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    return projection
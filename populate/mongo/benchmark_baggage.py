@@ -0,0 +1,100 @@
+"""
+Сравнение двух способов поиска багажа по номеру бирки:
+
+1. embedded — многоключевой индекс Tickets.Baggage.BaggageNumber в коллекции
+   Passengers (используется API, см. app/routers/baggage.py);
+2. collection — отдельная коллекция Baggage с уникальным индексом по
+   BaggageNumber, которую пришлось бы поддерживать при каждой записи.
+
+Коллекция Baggage для сравнения строится из Passengers через $out и
+удаляется после замеров. Запуск после populate_mongo.py:
+
+    python benchmark_baggage.py
+"""
+import os
+import random
+import statistics
+import time
+
+from pymongo import ASCENDING, MongoClient
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0")
+BENCHMARK_SAMPLE_SIZE = int(os.getenv("BENCHMARK_SAMPLE_SIZE", "2000"))
+BENCHMARK_COLLECTION = "BaggageBenchmark"
+
+
+def sample_baggage_numbers(passengers, size):
+    pipeline = [
+        {"$sample": {"size": size}},
+        {"$unwind": "$Tickets"},
+        {"$project": {"_id": 0, "BaggageNumber": "$Tickets.Baggage.BaggageNumber"}},
+    ]
+    numbers = [doc["BaggageNumber"] for doc in passengers.aggregate(pipeline)]
+    random.shuffle(numbers)
+    return numbers[:size]
+
+
+def build_baggage_collection(db):
+    start = time.perf_counter()
+    db["Passengers"].aggregate([
+        {"$unwind": "$Tickets"},
+        {"$project": {
+            "_id": "$Tickets.Baggage.BaggageNumber",
+            "PassengerID": 1,
+            "TicketNumber": "$Tickets.TicketNumber",
+            "Baggage": "$Tickets.Baggage",
+        }},
+        {"$out": BENCHMARK_COLLECTION},
+    ])
+    db[BENCHMARK_COLLECTION].create_index([("Baggage.Location", ASCENDING), ("Baggage.BaggageStatus", ASCENDING)])
+    return time.perf_counter() - start
+
+
+def measure(lookup, numbers):
+    timings = []
+    for number in numbers:
+        start = time.perf_counter()
+        assert lookup(number) is not None
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "p50": statistics.median(timings),
+        "p99": timings[max(0, int(len(timings) * 0.99) - 1)],
+        "max": timings[-1],
+    }
+
+
+def index_size_mb(db, name):
+    return db.command("collStats", name)["totalIndexSize"] / 2**20
+
+
+def main():
+    client = MongoClient(MONGO_URI)
+    db = client["AirportFlightManagement"]
+    passengers = db["Passengers"]
+    numbers = sample_baggage_numbers(passengers, BENCHMARK_SAMPLE_SIZE)
+    print(f"Выборка: {len(numbers)} номеров багажа")
+
+    build_seconds = build_baggage_collection(db)
+    baggage = db[BENCHMARK_COLLECTION]
+    try:
+        embedded = measure(
+            lambda number: passengers.find_one(
+                {"Tickets.Baggage.BaggageNumber": number},
+                {"_id": 0, "PassengerID": 1, "Tickets": {"$elemMatch": {"Baggage.BaggageNumber": number}}}
+            ),
+            numbers
+        )
+        separate = measure(lambda number: baggage.find_one({"_id": number}), numbers)
+
+        print(f"embedded:   p50 {embedded['p50']:.2f} мс, p99 {embedded['p99']:.2f} мс, max {embedded['max']:.2f} мс, "
+              f"индексы {index_size_mb(db, 'Passengers'):.0f} МБ")
+        print(f"collection: p50 {separate['p50']:.2f} мс, p99 {separate['p99']:.2f} мс, max {separate['max']:.2f} мс, "
+              f"индексы {index_size_mb(db, BENCHMARK_COLLECTION):.0f} МБ, построение {build_seconds:.0f} с")
+    finally:
+        baggage.drop()
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
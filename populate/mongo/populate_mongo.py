@@ -11,6 +11,8 @@ fake.add_provider(AirTravelProvider)
 
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo1:27017,mongo2:27017,mongo3:27017/?replicaSet=rs0")
 NUM_RECORDS = 2000000
+# Число рейсов, которые создаёт populate_cassandra.py (FL0000001 и далее)
+NUM_FLIGHTS = int(os.getenv("NUM_FLIGHTS", "2000"))
 
 def generate_mongo_data(num):
     for _ in range(num):
@@ -22,6 +24,7 @@ def generate_mongo_data(num):
             baggage_number = fake.unique.uuid4()
             ticket = {
                 "TicketNumber": ticket_number,
+                "FlightNumber": f"FL{random.randint(1, NUM_FLIGHTS):07d}",
                 "Route": {
                     "Origin": fake.airport_iata(),
                     "Destination": fake.airport_iata()
@@ -57,7 +60,9 @@ def generate_mongo_data(num):
                 ["Mеждународный паспорт", "Место у прохода", "Питание для диабетиков", "Служебный живот", "Дополнительное место"], 
                 k=random.randint(0,3)
             ),
-            "Tickets": tickets
+            "Tickets": tickets,
+            # Поддерживаемое приложением число билетов (индексируется)
+            "TicketCount": len(tickets)
         }
         yield InsertOne(passenger)
 
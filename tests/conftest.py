@@ -1,7 +1,8 @@
 import pytest
+import time
 from fastapi.testclient import TestClient
 from app.main import app
-from app.database.mongodb import passengers_collection
+from app.database.mongodb import MONGO_URI
 from app.database.cassandra import session as cassandra_session
 from app.database.neo4j import driver as neo4j_driver
 from pymongo import MongoClient
@@ -14,8 +15,28 @@ def client():
     Фикстура для создания тестового клиента FastAPI.
     """
     with TestClient(app) as c:
+        # Подключение к базам данных идёт в фоне, ждём готовности
+        deadline = time.monotonic() + 60
+        while c.get("/system/ready").status_code != 200:
+            assert time.monotonic() < deadline, "Приложение не подключилось к базам данных"
+            time.sleep(0.2)
         yield c
 
+@pytest.fixture(scope="session")
+def wait_for_outbox(client):
+    """
+    Фикстура ожидания синхронизации Neo4j: связи рейсов применяются
+    фоновым обработчиком outbox, а не в самом запросе.
+    """
+    def wait(timeout=10.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if client.get("/system/outbox").json()["depth"] == 0:
+                return
+            time.sleep(0.1)
+        raise AssertionError("Outbox синхронизации Neo4j не обработан")
+    return wait
+
 @pytest.fixture(scope="session")
 def mongodb_test_db():
     """
@@ -28,6 +49,16 @@ def mongodb_test_db():
     # Очистка после тестов
     test_db['Passengers'].delete_many({})
 
+@pytest.fixture(scope="session")
+def passengers_collection():
+    """
+    Синхронный доступ к коллекции пассажиров приложения для проверок в тестах
+    (само приложение использует асинхронный клиент).
+    """
+    mongo_client = MongoClient(MONGO_URI)
+    yield mongo_client['AirportFlightManagement']['Passengers']
+    mongo_client.close()
+
 @pytest.fixture(scope="session")
 def cassandra_test_session():
     """
@@ -0,0 +1,59 @@
+from fastapi.testclient import TestClient
+
+def test_track_and_search_baggage(client: TestClient, mongodb_test_db, passengers_collection):
+    """
+    Тестирование поиска багажа по номеру бирки, местоположению и статусу.
+    """
+    passenger_data = {
+        "PassengerID": "P4000001",
+        "LastName": "Смирнова",
+        "FirstName": "Ольга",
+        "MiddleName": None,
+        "DateOfBirth": "1992-07-01",
+        "ContactInfo": {
+            "Email": "olga.smirnova@example.com",
+            "Phone": "+79991234570",
+            "Address": "г. Казань, ул. Баумана, д. 5"
+        },
+        "IsTransit": False,
+        "SpecialRequirements": None,
+        "Tickets": [
+            {
+                "TicketNumber": f"T400000{i}",
+                "Route": {"Origin": "KZN", "Destination": "SVO"},
+                "DepartureTime": "2024-12-22T10:00:00Z",
+                "ArrivalTime": "2024-12-22T12:00:00Z",
+                "Class": "Economy",
+                "Price": 500.00,
+                "TicketStatus": "Confirmed",
+                "Ratings": [5],
+                "Baggage": {
+                    "BaggageNumber": f"B400000{i}",
+                    "BaggageType": "Suitcase",
+                    "Weight": 15.0,
+                    "BaggageStatus": status,
+                    "Location": "KZN-TEST"
+                }
+            }
+            for i, status in ((1, "Checked"), (2, "Hand"))
+        ]
+    }
+    assert client.post("/passengers/", json=passenger_data).status_code == 200
+    
+    response = client.get("/baggage/B4000002")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["PassengerID"] == "P4000001"
+    assert data["TicketNumber"] == "T4000002"
+    assert data["Baggage"]["BaggageStatus"] == "Hand"
+    assert client.get("/baggage/B4999999").status_code == 404
+    
+    # Оба условия относятся к одному и тому же багажу
+    response = client.get("/baggage/", params={"location": "KZN-TEST", "status": "Checked"})
+    assert response.status_code == 200
+    assert [item["Baggage"]["BaggageNumber"] for item in response.json()] == ["B4000001"]
+    response = client.get("/baggage/", params={"location": "KZN-TEST"})
+    assert len(response.json()) == 2
+    assert client.get("/baggage/").status_code == 400
+    
+    passengers_collection.delete_one({"PassengerID": "P4000001"})
@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from app.services import cache
+from app.services.cache import MISSING, CacheBackend, InMemoryLRUCache
+
+
+def test_cache_backend_is_abstract():
+    """
+    Тестирование того, что интерфейс кэша нельзя использовать без реализации методов.
+    """
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+def test_lru_eviction_order():
+    """
+    Тестирование вытеснения давно не использованных записей.
+    """
+    async def scenario():
+        lru = InMemoryLRUCache(maxsize=2, ttl=60)
+        await lru.set("a", 1)
+        await lru.set("b", 2)
+        # Чтение делает «a» недавно использованной, вытесняется «b»
+        assert await lru.get("a") == 1
+        await lru.set("c", 3)
+        assert await lru.get("b") is MISSING
+        assert await lru.get("a") == 1
+        assert await lru.get("c") == 3
+        assert lru.stats()["evictions"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_ttl_expiry(monkeypatch):
+    """
+    Тестирование истечения срока жизни записи.
+    """
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    async def scenario():
+        lru = InMemoryLRUCache(maxsize=10, ttl=5)
+        await lru.set("a", 1)
+        now[0] += 4.9
+        assert await lru.get("a") == 1
+        now[0] += 0.1
+        assert await lru.get("a") is MISSING
+        stats = lru.stats()
+        assert stats["expirations"] == 1
+        assert stats["size"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_stale_fill_after_invalidation_is_not_stored():
+    """
+    Тестирование защиты от сохранения значения, загруженного до инвалидации ключа.
+    """
+    async def scenario():
+        lru = InMemoryLRUCache(maxsize=10, ttl=60)
+        loading = asyncio.Event()
+        invalidated = asyncio.Event()
+
+        async def slow_loader():
+            loading.set()
+            await invalidated.wait()
+            return "old"
+
+        fill = asyncio.create_task(lru.get_or_load("a", slow_loader))
+        await loading.wait()
+        await lru.delete("a")
+        invalidated.set()
+        # Загруженное значение возвращается вызывающему, но не попадает в кэш
+        assert await fill == "old"
+        assert await lru.get("a") is MISSING
+
+        async def loader():
+            return "new"
+
+        assert await lru.get_or_load("a", loader) == "new"
+        assert await lru.get("a") == "new"
+
+    asyncio.run(scenario())
@@ -1,16 +1,76 @@
-# import pytest
-# from fastapi.testclient import TestClient
-# from app.database.cassandra import cassandra_session
-# from fastapi.encoders import jsonable_encoder
-#
-# def test_average_tickets_per_flight(client: TestClient, cassandra_test_session):
-#     """
-#     Тестирование пользовательской функции Cassandra для расчёта среднего количества билетов на рейс.
-#     """
-#     response = client.get("/flights/average_tickets")
-#     assert response.status_code == 200
-#     average = response.json()
-#     assert isinstance(average, float)
-#     # Предположим, что в базе данных есть 2 рейса и 3 билета
-#     assert average >= 1.5  # Примерная проверка
-#
+from fastapi.testclient import TestClient
+
+
+def test_ticket_counters(client: TestClient):
+    """
+    Тестирование счётчиков билетов: выдача, отмена и удаление билетов
+    меняют число билетов рейса и среднее число билетов на рейс.
+    """
+    flight_number = "FL6000001"
+    response = client.post("/flights/", json={
+        "FlightNumber": flight_number,
+        "ScheduledDepartureTime": "2025-04-01T08:00:00",
+        "ScheduledArrivalTime": "2025-04-01T12:00:00",
+        "FlightStatus": "Confirmed",
+        "AirlineID": "AL0001",
+        "AircraftID": "AC00001",
+        "RouteID": "R00001"
+    })
+    assert response.status_code == 200
+    average_before = client.get("/flights/average_tickets").json()
+
+    def ticket(number, status="Confirmed"):
+        return {
+            "TicketNumber": number,
+            "FlightNumber": flight_number,
+            "Route": {"Origin": "SVO", "Destination": "LED"},
+            "DepartureTime": "2025-04-01T08:00:00",
+            "ArrivalTime": "2025-04-01T12:00:00",
+            "Class": "Economy",
+            "Price": 150.0,
+            "TicketStatus": status,
+            "Ratings": [5],
+            "Baggage": {
+                "BaggageNumber": f"BG{number}",
+                "BaggageType": "Suitcase",
+                "Weight": 20.0,
+                "BaggageStatus": "Checked",
+                "Location": "SVO"
+            }
+        }
+
+    response = client.post("/passengers/", json={
+        "PassengerID": "P600001",
+        "LastName": "Петров",
+        "FirstName": "Пётр",
+        "MiddleName": None,
+        "DateOfBirth": "1990-01-01",
+        "ContactInfo": {"Email": "petrov@example.com", "Phone": "+70000000000", "Address": "Москва"},
+        "IsTransit": False,
+        "SpecialRequirements": None,
+        "Tickets": [ticket("T600001"), ticket("T600002"), ticket("T600003", status="Cancelled")]
+    })
+    assert response.status_code == 200
+
+    def count():
+        response = client.get(f"/flights/{flight_number}/tickets/count")
+        assert response.status_code == 200
+        return response.json()
+
+    # Отменённый билет не учитывается
+    assert count() == 2
+    assert client.get("/flights/average_tickets").json() > average_before
+
+    response = client.patch("/passengers/P600001/tickets/T600001", json={"TicketStatus": "Cancelled"})
+    assert response.status_code == 200
+    assert response.json()["TicketStatus"] == "Cancelled"
+    assert count() == 1
+
+    # Билеты удалённого рейса больше не учитываются
+    assert client.delete(f"/flights/{flight_number}").status_code == 200
+    assert count() == 0
+    assert client.get("/flights/average_tickets").status_code == 200
+    
+    # Изменения билетов удалённого рейса счётчики не меняют
+    assert client.delete("/passengers/P600001").status_code == 200
+    assert count() == 0
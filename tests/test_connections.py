@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta, timezone
+from app.models.route import Route
+from app.services.connections import FlightSchedule
+
+# Время в UTC: FlightSchedule считает время без часового пояса UTC
+START = datetime(2024, 12, 25, 8, 0, tzinfo=timezone.utc)
+
+def at(hours):
+    return START + timedelta(hours=hours)
+
+def flight_numbers(options):
+    return [(transfers, [leg[3] for leg in legs]) for transfers, legs in options]
+
+def test_connection_search():
+    """
+    Тестирование поиска стыковок по расписанию: самый ранний прилёт,
+    наименьшее число пересадок, минимальное время стыковки и изменения рейсов.
+    """
+    schedule = FlightSchedule([
+        Route(RouteID="R1", Origin="SVO", Destination="KZN", Distance=700, TravelTime=60),
+        Route(RouteID="R2", Origin="KZN", Destination="LED", Distance=1500, TravelTime=60),
+        Route(RouteID="R3", Origin="SVO", Destination="LED", Distance=650, TravelTime=270),
+    ])
+    schedule.upsert("FL1", at(0), at(1), "R1")        # SVO 08:00 -> KZN 09:00
+    schedule.upsert("FL2", at(1.5), at(2.5), "R2")    # KZN 09:30 -> LED 10:30
+    schedule.upsert("FL3", at(0.5), at(5), "R3")      # SVO 08:30 -> LED 13:00
+    
+    def search(min_connection_minutes):
+        return flight_numbers(schedule.search("SVO", "LED", START.timestamp() - 1, min_connection_minutes * 60, 3, 24 * 3600))
+    
+    # Прямой рейс — наименьшее число пересадок, стыковка — самый ранний прилёт
+    assert search(30) == [(0, ["FL3"]), (1, ["FL1", "FL2"])]
+    # 45 минут на пересадку в KZN не хватает
+    assert search(45) == [(0, ["FL3"])]
+    
+    # Перенос и отмена рейсов применяются без перестройки расписания
+    schedule.upsert("FL2", at(3), at(4), "R2")
+    assert search(45) == [(0, ["FL3"]), (1, ["FL1", "FL2"])]
+    schedule.remove("FL3")
+    assert search(45) == [(1, ["FL1", "FL2"])]
@@ -1,11 +1,12 @@
 import pytest
+import json
 from fastapi.testclient import TestClient
 from app.models.flight import Flight
 from app.database.cassandra import cassandra_session
 from app.database.neo4j import neo4j_driver
 from fastapi.encoders import jsonable_encoder
 
-def test_create_flight(client: TestClient, cassandra_test_session, neo4j_test_driver):
+def test_create_flight(client: TestClient, cassandra_test_session, neo4j_test_driver, wait_for_outbox):
     """
     Тестирование создания рейса.
     """
@@ -32,7 +33,8 @@ def test_create_flight(client: TestClient, cassandra_test_session, neo4j_test_dr
     assert flight is not None
     assert flight.flightstatus == "Confirmed"
     
-    # Проверка связей в Neo4j
+    # Проверка связей в Neo4j после обработки outbox
+    wait_for_outbox()
     with neo4j_test_driver.session() as session:
         cypher_query = """
             MATCH (f:Flight {FlightNumber: $flight_number})-[:AFFILIATED_WITH]->(a:Airline),
@@ -47,6 +49,32 @@ def test_create_flight(client: TestClient, cassandra_test_session, neo4j_test_dr
         assert record["ac"]["AircraftID"] == "AC00001"
         assert record["r"]["RouteID"] == "R00001"
 
+def test_create_flight_duplicate(client: TestClient, cassandra_test_session):
+    """
+    Тестирование повторного создания рейса с существующим номером.
+    """
+    flight_data = {
+        "FlightNumber": "FL2000001",
+        "ScheduledDepartureTime": "2024-12-25T09:00:00",
+        "ScheduledArrivalTime": "2024-12-25T13:00:00",
+        "ActualDepartureTime": None,
+        "ActualArrivalTime": None,
+        "FlightStatus": "Delayed",
+        "AirlineID": "AL0003",
+        "AircraftID": "AC00003",
+        "RouteID": "R00003"
+    }
+    
+    response = client.post("/flights/", json=flight_data)
+    assert response.status_code == 400
+    
+    # Существующая запись не перезаписана
+    query = "SELECT * FROM flights WHERE flightnumber = %s"
+    result = cassandra_test_session.execute(query, ("FL2000001",))
+    flight = result.one()
+    assert flight.flightstatus == "Confirmed"
+    assert flight.airlineid == "AL0001"
+
 def test_get_flight(client: TestClient, cassandra_test_session):
     """
     Тестирование получения рейса по номеру.
@@ -57,8 +85,13 @@ def test_get_flight(client: TestClient, cassandra_test_session):
     data = response.json()
     assert data["FlightNumber"] == flight_number
     assert data["FlightStatus"] == "Confirmed"
+    
+    # Частичный ответ: только запрошенные поля и FlightNumber
+    response = client.get(f"/flights/{flight_number}", params={"fields": "FlightStatus,RouteID"})
+    assert response.status_code == 200
+    assert response.json() == {"FlightNumber": flight_number, "FlightStatus": "Confirmed", "RouteID": "R00001"}
 
-def test_update_flight(client: TestClient, cassandra_test_session, neo4j_test_driver):
+def test_update_flight(client: TestClient, cassandra_test_session, neo4j_test_driver, wait_for_outbox):
     """
     Тестирование обновления рейса.
     """
@@ -86,7 +119,13 @@ def test_update_flight(client: TestClient, cassandra_test_session, neo4j_test_dr
     assert flight is not None
     assert flight.flightstatus == "Delayed"
     
-    # Проверка обновленных связей в Neo4j
+    # Кэш рейса инвалидирован: чтение возвращает обновлённые данные
+    response = client.get(f"/flights/{flight_number}")
+    assert response.status_code == 200
+    assert response.json()["FlightStatus"] == "Delayed"
+    
+    # Проверка обновленных связей в Neo4j после обработки outbox
+    wait_for_outbox()
     with neo4j_test_driver.session() as session:
         cypher_query = """
             MATCH (f:Flight {FlightNumber: $flight_number})-[:AFFILIATED_WITH]->(a:Airline),
@@ -101,7 +140,7 @@ def test_update_flight(client: TestClient, cassandra_test_session, neo4j_test_dr
         assert record["ac"]["AircraftID"] == "AC00002"
         assert record["r"]["RouteID"] == "R00002"
 
-def test_delete_flight(client: TestClient, cassandra_test_session, neo4j_test_driver):
+def test_delete_flight(client: TestClient, cassandra_test_session, neo4j_test_driver, wait_for_outbox):
     """
     Тестирование удаления рейса.
     """
@@ -116,7 +155,8 @@ def test_delete_flight(client: TestClient, cassandra_test_session, neo4j_test_dr
     flight = result.one()
     assert flight is None
     
-    # Проверка удаления узлов и связей в Neo4j
+    # Проверка удаления узлов и связей в Neo4j после обработки outbox
+    wait_for_outbox()
     with neo4j_test_driver.session() as session:
         cypher_query = """
             MATCH (f:Flight {FlightNumber: $flight_number})
@@ -126,7 +166,7 @@ def test_delete_flight(client: TestClient, cassandra_test_session, neo4j_test_dr
         record = result.single()
         assert record is None
 
-def test_get_flights_by_passenger(client: TestClient, cassandra_test_session, neo4j_test_driver, mongodb_test_db):
+def test_get_flights_by_passenger(client: TestClient, cassandra_test_session, neo4j_test_driver, mongodb_test_db, passengers_collection):
     """
     Тестирование получения рейсов, связанных с пассажиром.
     """
@@ -220,3 +260,195 @@ def test_get_flights_by_passenger(client: TestClient, cassandra_test_session, ne
     assert len(data) == 1
     assert data[0]["FlightNumber"] == "FL2000002"
 
+
+def test_create_flights_bulk(client: TestClient, cassandra_test_session, neo4j_test_driver, wait_for_outbox):
+    """
+    Тестирование массовой загрузки рейсов в формате NDJSON.
+    """
+    flights = [
+        {
+            "FlightNumber": f"FL300000{i}",
+            "ScheduledDepartureTime": "2024-12-27T08:00:00",
+            "ScheduledArrivalTime": "2024-12-27T12:00:00",
+            "ActualDepartureTime": None,
+            "ActualArrivalTime": None,
+            "FlightStatus": "On Time",
+            "AirlineID": "AL0001",
+            "AircraftID": "AC00001",
+            "RouteID": "R00001"
+        }
+        for i in range(1, 4)
+    ]
+    lines = [json.dumps(f) for f in flights]
+    lines.append(json.dumps(flights[0]))            # Дубликат
+    lines.append(json.dumps({"FlightNumber": "FL3000009"}))  # Не проходит валидацию
+    body = "\n".join(lines) + "\n"
+    
+    response = client.post("/flights/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["Total"] == 5
+    assert data["Succeeded"] == 3
+    assert data["Failed"] == 2
+    statuses = [item["Status"] for item in data["Items"]]
+    # Внутри части побеждает первое вхождение номера
+    assert statuses == ["created", "created", "created", "duplicate", "invalid"]
+    
+    # Проверка в Cassandra
+    query = "SELECT * FROM flights WHERE flightnumber = %s"
+    for f in flights:
+        assert cassandra_test_session.execute(query, (f["FlightNumber"],)).one() is not None
+    
+    # Проверка связей в Neo4j после обработки outbox
+    wait_for_outbox()
+    with neo4j_test_driver.session() as session:
+        result = session.run("""
+            MATCH (f:Flight)-[:HAS_ROUTE]->(r:Route {RouteID: "R00001"})
+            WHERE f.FlightNumber STARTS WITH "FL300000"
+            RETURN count(f) AS total
+        """)
+        assert result.single()["total"] == 3
+
+
+def test_list_flights(client: TestClient, cassandra_test_session):
+    """
+    Тестирование постраничного списка рейсов с выбором полей.
+    """
+    # Обход всех страниц по токену: каждый рейс встречается один раз
+    seen = []
+    params = {"limit": 2, "fields": "FlightStatus"}
+    while True:
+        response = client.get("/flights/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 2
+        for item in page:
+            assert set(item) == {"FlightNumber", "FlightStatus"}
+        seen.extend(item["FlightNumber"] for item in page)
+        if "X-Next-Token" not in response.headers:
+            break
+        params["next"] = response.headers["X-Next-Token"]
+    assert len(seen) == len(set(seen))
+    assert {"FL3000001", "FL3000002", "FL3000003"} <= set(seen)
+    
+    assert client.get("/flights/", params={"fields": "Unknown"}).status_code == 400
+    assert client.get("/flights/", params={"limit": 0}).status_code == 422
+    # Токен, который не разбирается как base64 или как paging_state Cassandra
+    for token in ("некорректный", "AAAA", "bm90LWEtcGFnaW5nLXN0YXRl"):
+        assert client.get("/flights/", params={"next": token}).status_code == 400
+
+
+def test_flight_board(client: TestClient, cassandra_test_session, wait_for_outbox):
+    """
+    Тестирование табло вылетов и прилётов: создание, перенос и удаление рейса.
+    """
+    route = cassandra_test_session.execute(
+        "SELECT origin, destination FROM routes WHERE routeid = %s", ("R00001",)
+    ).one()
+    flight_data = {
+        "FlightNumber": "FL4000001",
+        "ScheduledDepartureTime": "2024-12-30T22:00:00",
+        "ScheduledArrivalTime": "2024-12-31T02:00:00",
+        "FlightStatus": "Confirmed",
+        "AirlineID": "AL0001",
+        "AircraftID": "AC00001",
+        "RouteID": "R00001"
+    }
+    response = client.post("/flights/", json=flight_data)
+    assert response.status_code == 200
+    wait_for_outbox()
+
+    def board(airport, direction, day):
+        # Обход всех страниц табло по токену
+        flights = []
+        params = {"date": day, "limit": 100}
+        while True:
+            response = client.get(f"/airports/{airport}/{direction}", params=params)
+            assert response.status_code == 200
+            assert len(response.json()) <= 100
+            flights.extend(flight["FlightNumber"] for flight in response.json())
+            if "X-Next-Token" not in response.headers:
+                return flights
+            params["next"] = response.headers["X-Next-Token"]
+
+    # Вылет и прилёт попадают в разные дни
+    assert "FL4000001" in board(route.origin, "departures", "2024-12-30")
+    assert "FL4000001" in board(route.destination, "arrivals", "2024-12-31")
+    assert "FL4000001" not in board(route.destination, "arrivals", "2024-12-30")
+    response = client.get(f"/airports/{route.origin}/departures", params={"date": "2024-12-30", "limit": 1})
+    assert len(response.json()) == 1
+    response = client.get(
+        f"/airports/{route.origin}/departures",
+        params={"date": "2024-12-30", "next": "bm90LWEtcGFnaW5nLXN0YXRl"}
+    )
+    assert response.status_code == 400
+
+    # Перенос рейса убирает его со старой даты
+    flight_data["ScheduledDepartureTime"] = "2025-01-02T09:00:00"
+    flight_data["ScheduledArrivalTime"] = "2025-01-02T13:00:00"
+    response = client.put("/flights/FL4000001", json=flight_data)
+    assert response.status_code == 200
+    wait_for_outbox()
+    assert "FL4000001" not in board(route.origin, "departures", "2024-12-30")
+    assert "FL4000001" not in board(route.destination, "arrivals", "2024-12-31")
+    assert "FL4000001" in board(route.origin, "departures", "2025-01-02")
+
+    response = client.delete("/flights/FL4000001")
+    assert response.status_code == 200
+    wait_for_outbox()
+    assert "FL4000001" not in board(route.origin, "departures", "2025-01-02")
+    assert "FL4000001" not in board(route.destination, "arrivals", "2025-01-02")
+
+
+def test_search_flights(client: TestClient, cassandra_test_session):
+    """
+    Тестирование поиска рейсов по нескольким условиям с постраничной выдачей.
+    """
+    for i, (status, day) in enumerate([("Delayed", 10), ("Delayed", 12), ("Confirmed", 12), ("Delayed", 20)], start=1):
+        response = client.post("/flights/", json={
+            "FlightNumber": f"FL500000{i}",
+            "ScheduledDepartureTime": f"2025-03-{day}T08:00:00",
+            "ScheduledArrivalTime": f"2025-03-{day}T12:00:00",
+            "FlightStatus": status,
+            "AirlineID": "AL0999",
+            "AircraftID": "AC00001",
+            "RouteID": "R00001"
+        })
+        assert response.status_code == 200
+
+    # Задержанные рейсы авиакомпании за неделю, по одному на странице
+    seen = []
+    params = {
+        "airline": "AL0999",
+        "status": "Delayed",
+        "departure_from": "2025-03-10T00:00:00",
+        "departure_to": "2025-03-17T00:00:00",
+        "limit": 1,
+        "fields": "FlightStatus",
+    }
+    while True:
+        response = client.get("/flights/search", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert len(page) <= 1
+        seen.extend(item["FlightNumber"] for item in page)
+        if "X-Next-Token" not in response.headers:
+            break
+        params["next"] = response.headers["X-Next-Token"]
+    assert sorted(seen) == ["FL5000001", "FL5000002"]
+
+    response = client.get("/flights/search", params={"airline": "AL0999"})
+    assert response.status_code == 200
+    assert len(response.json()) == 4
+
+    assert client.get("/flights/search").status_code == 400
+    response = client.get("/flights/search", params={"airline": "AL0999", "next": "bm90LWEtcGFnaW5nLXN0YXRl"})
+    assert response.status_code == 400
+    response = client.get("/flights/search", params={
+        "departure_from": "2025-03-17T00:00:00",
+        "departure_to": "2025-03-10T00:00:00"
+    })
+    assert response.status_code == 400
+
+    for i in range(1, 5):
+        assert client.delete(f"/flights/FL500000{i}").status_code == 200
@@ -1,10 +1,11 @@
 import pytest
+import json
 from fastapi.testclient import TestClient
 from app.models.passenger import Passenger
-from app.database.mongodb import passengers_collection
+from app.utils.pagination import encode_page_token
 from fastapi.encoders import jsonable_encoder
 
-def test_create_passenger(client: TestClient, mongodb_test_db):
+def test_create_passenger(client: TestClient, mongodb_test_db, passengers_collection):
     """
     Тестирование создания пассажира.
     """
@@ -54,6 +55,34 @@ def test_create_passenger(client: TestClient, mongodb_test_db):
     assert passenger_in_db is not None
     assert passenger_in_db["LastName"] == "Иванов"
 
+def test_create_passenger_duplicate(client: TestClient, mongodb_test_db, passengers_collection):
+    """
+    Тестирование повторного создания пассажира с существующим ID.
+    """
+    passenger_data = {
+        "PassengerID": "P1000001",
+        "LastName": "Смирнов",
+        "FirstName": "Алексей",
+        "MiddleName": None,
+        "DateOfBirth": "1990-01-01",
+        "ContactInfo": {
+            "Email": "alexey.smirnov@example.com",
+            "Phone": "+79990000000",
+            "Address": "г. Москва, ул. Арбат, д. 10"
+        },
+        "IsTransit": True,
+        "SpecialRequirements": None,
+        "Tickets": []
+    }
+    
+    response = client.post("/passengers/", json=passenger_data)
+    assert response.status_code == 400
+    
+    # Проверка, что в базе остался только исходный документ
+    assert passengers_collection.count_documents({"PassengerID": "P1000001"}) == 1
+    passenger_in_db = passengers_collection.find_one({"PassengerID": "P1000001"})
+    assert passenger_in_db["LastName"] == "Иванов"
+
 def test_get_passenger(client: TestClient, mongodb_test_db):
     """
     Тестирование получения пассажира по ID.
@@ -64,8 +93,14 @@ def test_get_passenger(client: TestClient, mongodb_test_db):
     data = response.json()
     assert data["PassengerID"] == passenger_id
     assert data["LastName"] == "Иванов"
+    
+    # Частичный ответ: только запрошенные поля и PassengerID
+    response = client.get(f"/passengers/{passenger_id}", params={"fields": "LastName,FirstName"})
+    assert response.status_code == 200
+    assert response.json() == {"PassengerID": passenger_id, "LastName": "Иванов", "FirstName": "Иван"}
+    assert client.get(f"/passengers/{passenger_id}", params={"fields": "Unknown"}).status_code == 400
 
-def test_update_passenger(client: TestClient, mongodb_test_db):
+def test_update_passenger(client: TestClient, mongodb_test_db, passengers_collection):
     """
     Тестирование обновления данных пассажира.
     """
@@ -116,7 +151,7 @@ def test_update_passenger(client: TestClient, mongodb_test_db):
     assert passenger_in_db["MiddleName"] == "Петрович"
     assert "Дополнительное место" in passenger_in_db["SpecialRequirements"]
 
-def test_delete_passenger(client: TestClient, mongodb_test_db):
+def test_delete_passenger(client: TestClient, mongodb_test_db, passengers_collection):
     """
     Тестирование удаления пассажира.
     """
@@ -129,7 +164,7 @@ def test_delete_passenger(client: TestClient, mongodb_test_db):
     passenger_in_db = passengers_collection.find_one({"PassengerID": passenger_id})
     assert passenger_in_db is None
 
-def test_get_passengers_with_min_tickets(client: TestClient, mongodb_test_db):
+def test_get_passengers_with_min_tickets(client: TestClient, mongodb_test_db, passengers_collection):
     """
     Тестирование получения пассажиров с минимальным количеством билетов.
     """
@@ -246,4 +281,107 @@ def test_get_passengers_with_min_tickets(client: TestClient, mongodb_test_db):
     assert response.status_code == 200
     data = response.json()
     assert len(data) == 2
+    assert passengers_collection.find_one({"PassengerID": "P1000002"})["TicketCount"] == 2
+    
+    # Постраничная выдача по токену: страницы не пересекаются
+    first_page = client.get("/passengers/tickets/count/1", params={"limit": 1})
+    second_page = client.get(
+        "/passengers/tickets/count/1",
+        params={"limit": 1, "next": first_page.headers["X-Next-Token"]}
+    )
+    assert len(first_page.json()) == 1 and len(second_page.json()) == 1
+    assert first_page.json()[0]["PassengerID"] != second_page.json()[0]["PassengerID"]
+    assert client.get("/passengers/tickets/count/1", params={"limit": 0}).status_code == 422
+    assert client.get("/passengers/tickets/count/1", params={"next": "некорректный"}).status_code == 400
+    # Значения токена с другими типами (например, операторы MongoDB) отклоняются
+    for position in (
+        {"TicketCount": {"$gt": 0}, "PassengerID": "P1000001"},
+        {"TicketCount": 1, "PassengerID": {"$ne": None}},
+        {"TicketCount": "1", "PassengerID": "P1000001"},
+        {"TicketCount": True, "PassengerID": "P1000001"},
+    ):
+        response = client.get("/passengers/tickets/count/1", params={"next": encode_page_token(position)})
+        assert response.status_code == 400
+    
+    # Потоковая выдача NDJSON
+    response = client.get("/passengers/tickets/count/2", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["PassengerID"] for line in lines] == ["P1000002"]
 
+
+def test_create_passengers_bulk(client: TestClient, mongodb_test_db, passengers_collection):
+    """
+    Тестирование массовой загрузки пассажиров в формате NDJSON.
+    """
+    passenger_data = {
+        "PassengerID": "P2000001",
+        "LastName": "Орлова",
+        "FirstName": "Анна",
+        "MiddleName": None,
+        "DateOfBirth": "1995-02-14",
+        "ContactInfo": {
+            "Email": "anna.orlova@example.com",
+            "Phone": "+79991234571",
+            "Address": "г. Казань, ул. Баумана, д. 5"
+        },
+        "IsTransit": False,
+        "SpecialRequirements": None,
+        "Tickets": []
+    }
+    duplicate_data = dict(passenger_data, PassengerID="P1000002")
+    lines = [
+        json.dumps(passenger_data),
+        json.dumps(duplicate_data),                    # PassengerID уже существует
+        json.dumps({"PassengerID": "P2000002"}),       # Не проходит валидацию
+        "{не json"                                     # Некорректная строка
+    ]
+    body = "\n".join(lines) + "\n"
+    
+    response = client.post("/passengers/bulk", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["Total"] == 4
+    assert data["Succeeded"] == 1
+    assert [item["Status"] for item in data["Items"]] == ["created", "duplicate", "invalid", "invalid"]
+    
+    # Проверка в базе данных
+    assert passengers_collection.find_one({"PassengerID": "P2000001"})["LastName"] == "Орлова"
+    assert passengers_collection.find_one({"PassengerID": "P1000002"})["LastName"] == "Петров"
+
+
+def test_update_ticket_and_baggage(client: TestClient, mongodb_test_db, passengers_collection):
+    """
+    Тестирование чтения и обновления отдельного билета и багажа пассажира.
+    """
+    # Второй билет пассажира, созданного в test_get_passengers_with_min_tickets
+    response = client.get("/passengers/P1000002/tickets/T1000003")
+    assert response.status_code == 200
+    assert response.json()["Baggage"]["BaggageNumber"] == "B1000003"
+    
+    response = client.patch("/passengers/P1000002/tickets/T1000003", json={"TicketStatus": "Cancelled"})
+    assert response.status_code == 200
+    assert response.json()["TicketNumber"] == "T1000003"
+    assert response.json()["TicketStatus"] == "Cancelled"
+    
+    response = client.patch("/passengers/P1000002/baggage/B1000003", json={"Location": "LED"})
+    assert response.status_code == 200
+    assert response.json() == client.get("/passengers/P1000002/baggage/B1000003").json()
+    assert response.json()["Location"] == "LED"
+    
+    # Остальные билеты не изменились
+    tickets = passengers_collection.find_one({"PassengerID": "P1000002"})["Tickets"]
+    assert [t["TicketStatus"] for t in tickets] == ["Confirmed", "Cancelled"]
+    assert [t["Baggage"]["Location"] for t in tickets] == ["SVO", "LED"]
+    
+    assert client.patch("/passengers/P1000002/tickets/T9999999", json={"TicketStatus": "Cancelled"}).status_code == 404
+    assert client.patch("/passengers/P1000002/baggage/B1000003", json={}).status_code == 400
+    
+    # Явный null для обязательного поля отклоняется и не попадает в документ
+    assert client.patch("/passengers/P1000002/tickets/T1000003", json={"Price": None}).status_code == 400
+    assert client.patch("/passengers/P1000002/baggage/B1000003", json={"Location": None}).status_code == 400
+    response = client.get("/passengers/P1000002/tickets/T1000003")
+    assert response.status_code == 200
+    assert response.json()["Price"] is not None
+    assert response.json()["Baggage"]["Location"] == "LED"
@@ -0,0 +1,29 @@
+from app.models.route import Route
+from app.services.route_graph import RouteGraph
+
+def make_route(route_id, origin, destination, distance, travel_time):
+    return Route(RouteID=route_id, Origin=origin, Destination=destination, Distance=distance, TravelTime=travel_time)
+
+def test_route_graph_shortest_paths():
+    """
+    Тестирование поиска кратчайших и альтернативных маршрутов по графу.
+    """
+    graph = RouteGraph([
+        make_route("R1", "SVO", "KZN", 700, 90),
+        make_route("R2", "KZN", "LED", 1500, 150),
+        make_route("R3", "SVO", "LED", 2500, 80),
+        make_route("R4", "SVO", "AER", 1400, 60),
+        make_route("R5", "AER", "LED", 1200, 40),
+        make_route("R6", "LED", "SVO", 650, 75),
+    ])
+    
+    by_distance = graph.shortest_paths("SVO", "LED", "distance", k=5)
+    assert [[r.RouteID for r in path] for path in by_distance] == [["R1", "R2"], ["R3"], ["R4", "R5"]]
+    
+    by_time = graph.shortest_paths("SVO", "LED", "time", k=1)
+    assert [[r.RouteID for r in path] for path in by_time] == [["R3"]]
+    
+    # Обратного маршрута из LED в KZN без пересадки нет
+    assert [[r.RouteID for r in path] for path in graph.shortest_paths("LED", "KZN")] == [["R6", "R1"]]
+    # Единственный вариант возвращается один раз, даже если запрошено больше
+    assert [[r.RouteID for r in path] for path in graph.shortest_paths("KZN", "AER", k=3)] == [["R2", "R6", "R4"]]
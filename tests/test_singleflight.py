@@ -0,0 +1,90 @@
+import asyncio
+import pytest
+from app.services.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    """
+    Тестирование объединения одновременных вызовов с одним ключом в один запрос.
+    """
+    async def scenario():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"FlightNumber": "FL0001"}
+
+        waiters = [asyncio.create_task(group.do("FL0001", fetch)) for _ in range(10)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters)
+
+        assert calls == 1
+        # Все ожидающие получают один и тот же результат
+        assert all(result is results[0] for result in results)
+        assert group.stats() == {"in_flight": 0, "executed": 1, "coalesced": 9}
+
+        # После завершения результат не хранится: следующий вызов делает новый запрос
+        await group.do("FL0001", fetch)
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_exception_reaches_all_waiters():
+    """
+    Тестирование передачи исключения запроса всем ожидающим.
+    """
+    async def scenario():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("нет соединения")
+
+        waiters = [asyncio.create_task(group.do("FL0001", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+
+        assert len(results) == 3
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert group.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_leader_cancellation_does_not_cancel_followers():
+    """
+    Тестирование отмены первого вызывающего: запрос продолжается для остальных.
+    """
+    async def scenario():
+        group = SingleFlight("test")
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return "result"
+
+        leader = asyncio.create_task(group.do("FL0001", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(group.do("FL0001", fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+
+        assert await follower == "result"
+        assert calls == 1
+
+    asyncio.run(scenario())
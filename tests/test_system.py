@@ -0,0 +1,17 @@
+def test_health(client):
+    """
+    Тест проверки жизнеспособности и готовности приложения.
+    """
+    assert client.get("/system/health").status_code == 200
+    response = client.get("/system/ready")
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+
+def test_mongo_indexes(client):
+    """
+    Тест наличия всех объявленных индексов MongoDB.
+    """
+    response = client.get("/system/indexes")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["Passengers"]["missing"] == []